@@ -0,0 +1,23 @@
+from copy import copy
+
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` without the database lookup on a cache hit.
+
+    Every request gets its own copies of the cached token and user, so
+    changes made while handling one request do not leak into others.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            generation = token_cache.generation
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, generation)
+        token = copy(token)
+        token.user = copy(token.user)
+        return token.user, token
@@ -0,0 +1,37 @@
+from http.client import HTTPConnection
+from math import ceil
+from urllib.parse import urlsplit
+
+from django.core.management.base import CommandError
+
+
+def percentile(latencies, share):
+    """Nearest-rank percentile of sorted latencies."""
+    if not latencies:
+        return 0.0
+    return latencies[max(ceil(share * len(latencies)) - 1, 0)]
+
+
+class Target:
+    """Server under test, ``name=http://host:port``."""
+
+    def __init__(self, spec):
+        name, _, url = spec.rpartition('=')
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError(f'Нужен адрес вида name=http://host:port: '
+                               f'{spec}')
+        self.name = name or parts.netloc
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+
+    def connect(self):
+        return HTTPConnection(self.host, self.port, timeout=30)
+
+    def request(self, connection, method, path, headers, body=None):
+        connection.request(method, self.prefix + path, body, headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def get(self, connection, path, headers):
+        return self.request(connection, 'GET', path, headers)
@@ -0,0 +1,284 @@
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from threading import Lock, Thread
+from time import monotonic
+
+from django.db import connection
+
+from foodgram.constants import (CATALOG_INDEX_TTL, RECIPE_CACHE_SIZE,
+                                RECIPE_CACHE_TTL, TOKEN_CACHE_SIZE,
+                                TOKEN_CACHE_TTL)
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Bounded in-process cache with least recently used eviction.
+
+    With ``ttl`` set, entries also expire that many seconds after being
+    stored, so changes made by other processes are picked up.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and not self._expired(entry)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                entry = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if self._expired(entry):
+                del self._data[key]
+                self.misses += 1
+                self.expirations += 1
+                self._evicted(key)
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
+
+    @staticmethod
+    def _expired(entry):
+        return entry[1] is not None and monotonic() >= entry[1]
+
+    def _store(self, key, value):
+        """Store ``value`` under ``key``, the lock must be held."""
+        expires = None if self.ttl is None else monotonic() + self.ttl
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            evicted, _ = self._data.popitem(last=False)
+            self.evictions += 1
+            self._evicted(evicted)
+
+    def _evicted(self, key):
+        """Hook for subclasses, called with the lock held."""
+
+
+class RecipeDocumentCache(LRUCache):
+    """Viewer-independent part of the recipe payload keyed by recipe id.
+
+    Every entry remembers the recipe, author, tags and ingredients it was
+    built from, so a change of any of them drops only the affected recipes.
+    A document built before an invalidation is not stored, ``generation``
+    taken ahead of the build tells the cache about it. Documents expire
+    after ``ttl`` seconds, for the changes made by other processes.
+    """
+
+    def __init__(self, max_size, ttl=RECIPE_CACHE_TTL):
+        super().__init__(max_size, ttl)
+        self.generation = 0
+        self._dependencies = {}
+        self._dependants = defaultdict(set)
+
+    def set(self, key, value, dependencies=(), generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._forget(key)
+            self._dependencies[key] = tuple(dependencies)
+            for dependency in dependencies:
+                self._dependants[dependency].add(key)
+            self._store(key, value)
+
+    def invalidate(self, model_name, pk):
+        """Drop every recipe built from the given object."""
+        with self._lock:
+            self.generation += 1
+            for key in tuple(self._dependants.get((model_name, pk), ())):
+                self._data.pop(key, None)
+                self._forget(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._dependencies.clear()
+            self._dependants.clear()
+        super().clear()
+
+    def _evicted(self, key):
+        self._forget(key)
+
+    def _forget(self, key):
+        for dependency in self._dependencies.pop(key, ()):
+            recipes = self._dependants[dependency]
+            recipes.discard(key)
+            if not recipes:
+                del self._dependants[dependency]
+
+
+class TokenCache(LRUCache):
+    """Token key to the token with its user, kept for ``ttl`` seconds.
+
+    Tokens of a user are dropped together by ``revoke_user``. A token
+    read before a revocation is not stored, ``generation`` taken ahead
+    of the read tells the cache about it. Changes made by other
+    processes are picked up when the entry expires.
+    """
+
+    def __init__(self, max_size, ttl=TOKEN_CACHE_TTL):
+        super().__init__(max_size, ttl)
+        self.generation = 0
+        self._users = {}
+        self._keys = defaultdict(set)
+
+    def set(self, key, token, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._forget(key)
+            self._users[key] = token.user_id
+            self._keys[token.user_id].add(key)
+            self._store(key, token)
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+            self._forget(key)
+
+    def revoke_user(self, user_id):
+        with self._lock:
+            self.generation += 1
+            for key in self._keys.pop(user_id, ()):
+                self._data.pop(key, None)
+                self._users.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._users.clear()
+            self._keys.clear()
+        super().clear()
+
+    def _evicted(self, key):
+        self._forget(key)
+
+    def _forget(self, key):
+        user_id = self._users.pop(key, None)
+        keys = self._keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[user_id]
+
+
+class VersionedSnapshot(ABC):
+    """Value derived from the database, rebuilt after ``invalidate``.
+
+    Subclasses implement ``build``. Once the value gets older than ``ttl``
+    seconds it is rebuilt in a background thread, so changes made by
+    other processes are picked up, while readers keep the previous value.
+    Only the first build and a build after ``invalidate`` in this process
+    are waited for. Changes passed to ``apply`` during a build are
+    replayed on the new value.
+    """
+
+    def __init__(self, ttl=CATALOG_INDEX_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self._lock = Lock()
+        self._build_lock = Lock()
+        self._state = None
+        self._pending = None
+
+    def invalidate(self):
+        self.version += 1
+
+    def get(self):
+        state = self._state
+        if state is not None and state[0] == self.version:
+            if monotonic() - state[1] >= self.ttl:
+                self._refresh_in_background()
+            return state[2]
+        with self._build_lock:
+            state = self._state
+            if state is None or state[0] != self.version:
+                self._refresh()
+            return self._state[2]
+
+    def apply(self, change):
+        """Call ``change`` with the value, and with the one being built."""
+        with self._lock:
+            if self._state is not None:
+                change(self._state[2])
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def _refresh(self):
+        version, started = self.version, monotonic()
+        with self._lock:
+            self._pending = []
+        try:
+            value = self.build()
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+        with self._lock:
+            for change in pending:
+                change(value)
+            self._state = (version, started, value)
+
+    def _refresh_in_background(self):
+        if not self._build_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self._refresh()
+            except Exception:
+                logger.exception('Failed to rebuild %s', self)
+            finally:
+                self._build_lock.release()
+                connection.close()
+
+        Thread(target=run, name='snapshot', daemon=True).start()
+
+    @abstractmethod
+    def build(self):
+        """Compute the value from the database."""
+
+
+recipe_documents = RecipeDocumentCache(RECIPE_CACHE_SIZE)
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
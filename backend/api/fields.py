@@ -0,0 +1,55 @@
+from uuid import UUID
+
+from django.core.files import File
+
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import ImageUpload
+
+
+class UploadedImage(File):
+    """Finished upload handed to the storage by path, not read in memory."""
+
+    def __init__(self, upload, name):
+        super().__init__(upload.file.open('rb'), name=name)
+        self.upload = upload
+
+    def temporary_file_path(self):
+        return self.upload.file.path
+
+    def discard(self):
+        self.close()
+        self.upload.delete()
+
+
+class UploadedImageField(Base64ImageField):
+    """Takes the token of an upload as well as a base64 string."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and ';base64,' not in data:
+            try:
+                token = UUID(data)
+            except ValueError:
+                pass
+            else:
+                return self.from_upload(token)
+        return super().to_internal_value(data)
+
+    def from_upload(self, token):
+        upload = ImageUpload.objects.filter(
+            pk=token, user=self.context['request'].user
+        ).first()
+        if upload is None or not upload.complete:
+            raise ValidationError('Загрузка не найдена или не завершена')
+        try:
+            with Image.open(upload.file.path) as image:
+                extension = image.format.lower()
+        except OSError:
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        return super(Base64FieldMixin, self).to_internal_value(
+            UploadedImage(upload, f'{upload.token}.{extension}')
+        )
@@ -1,24 +1,45 @@
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Ingredient, Recipe, Tag
+from foodgram.constants import SEARCH_RESULTS_LIMIT
+from recipes.models import Recipe
+
+from .search import search_recipes
+from .snapshots import tag_masks
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_masks.get().by_slug]
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags',
     )
     author = filters.CharFilter()
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'popular'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'ordering',
+        )
+
+    def filter_tags(self, queryset, name, value):
+        by_slug = tag_masks.get().by_slug
+        mask = 0
+        for slug in value:
+            mask |= by_slug.get(slug, 0)
+        return queryset.with_tags(mask)
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -30,10 +51,11 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        queryset, truncated = search_recipes(queryset, value)
+        if truncated:
+            self.request.search_limit = SEARCH_RESULTS_LIMIT
+        return queryset
 
-class IngredientNameFilter(SearchFilter):
-    search_param = 'name'
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by('-favorites_count', '-id')
@@ -0,0 +1,125 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from itertools import cycle, islice
+from time import perf_counter
+from urllib.parse import quote
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import Target, percentile
+
+INGREDIENT_QUERY = 'сол'
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает запросы в секунду и p99 горячих эндпоинтов чтения '
+            'на серверах WSGI и ASGI при растущей конкурентности')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', dest='targets', action='append', type=Target,
+            help='Сервер name=http://host:port, можно указать несколько'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 8, 32, 128],
+            help='Число одновременных клиентов на каждом шаге'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10.0,
+            help='Длительность шага в секундах'
+        )
+        parser.add_argument(
+            '--token', help='Токен, чтобы мерить запросы пользователя'
+        )
+
+    def handle(self, *args, targets, concurrency, duration, token,
+               **options):
+        targets = targets or [Target('local=http://127.0.0.1:8000')]
+        headers = {'Authorization': f'Token {token}'} if token else {}
+        paths = self.paths(targets[0], headers)
+        self.stdout.write(
+            f'{"server":<12}{"clients":>8}{"rps":>10}{"p50 ms":>10}'
+            f'{"p99 ms":>10}{"errors":>8}'
+        )
+        for clients in concurrency:
+            results = []
+            for target in targets:
+                rps, p50, p99, errors = self.run(
+                    target, paths, headers, clients, duration
+                )
+                results.append((target.name, rps, p99))
+                self.stdout.write(
+                    f'{target.name:<12}{clients:>8}{rps:>10.1f}'
+                    f'{p50 * 1000:>10.1f}{p99 * 1000:>10.1f}{errors:>8}'
+                )
+            base_name, base_rps, base_p99 = results[0]
+            for name, rps, p99 in results[1:]:
+                if base_rps and p99:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{name} / {base_name}: rps x{rps / base_rps:.2f}, '
+                        f'p99 x{p99 / base_p99:.2f}'
+                    ))
+
+    def paths(self, target, headers):
+        """Hot read endpoints, with a recipe id taken from the server."""
+        connection = target.connect()
+        try:
+            status, body = target.get(
+                connection, '/api/recipes/?limit=1', headers
+            )
+        except (OSError, HTTPException) as error:
+            raise CommandError(f'{target.name} недоступен: {error}')
+        finally:
+            connection.close()
+        if status != 200:
+            raise CommandError(f'{target.name} ответил {status}')
+        paths = [
+            '/api/tags/',
+            f'/api/ingredients/?name={quote(INGREDIENT_QUERY)}',
+            '/api/recipes/',
+        ]
+        recipes = json.loads(body)['results']
+        if recipes:
+            paths.append(f'/api/recipes/{recipes[0]["id"]}/')
+        return paths
+
+    def run(self, target, paths, headers, clients, duration):
+        deadline = perf_counter() + duration
+        with ThreadPoolExecutor(clients) as executor:
+            results = list(executor.map(
+                lambda offset: self.client(
+                    target, paths, headers, offset, deadline
+                ),
+                range(clients)
+            ))
+        latencies = sorted(
+            latency for client_latencies, _ in results
+            for latency in client_latencies
+        )
+        errors = sum(client_errors for _, client_errors in results)
+        return (
+            len(latencies) / duration, percentile(latencies, 0.5),
+            percentile(latencies, 0.99), errors
+        )
+
+    @staticmethod
+    def client(target, paths, headers, offset, deadline):
+        """Requests of one keep-alive client until the deadline."""
+        connection = target.connect()
+        latencies, errors = [], 0
+        for path in islice(cycle(paths), offset % len(paths), None):
+            started = perf_counter()
+            if started >= deadline:
+                break
+            try:
+                status, _ = target.get(connection, path, headers)
+            except (OSError, HTTPException):
+                connection.close()
+                status = None
+            if status == 200:
+                latencies.append(perf_counter() - started)
+            else:
+                errors += 1
+        connection.close()
+        return latencies, errors
@@ -0,0 +1,289 @@
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from random import Random
+from time import perf_counter
+from urllib.parse import quote
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import Target, percentile
+
+# Endpoint, weight, whether it needs a token.
+MIX = (
+    ('recipe_list', 30, False),
+    ('recipe_detail', 20, False),
+    ('ingredient_search', 20, False),
+    ('subscriptions', 10, True),
+    ('favorite_toggle', 8, True),
+    ('shopping_cart_toggle', 8, True),
+    ('download_shopping_cart', 4, True),
+)
+AUTH_ENDPOINTS = {endpoint for endpoint, _, needs_token in MIX if needs_token}
+SAMPLE_RECIPES = 100
+SAMPLE_PREFIXES = 50
+PREFIX_LENGTH = 3
+
+
+class TrafficMix:
+    """Weighted random API calls built from the data of the server."""
+
+    def __init__(self, tags, recipes, prefixes, authenticated):
+        self.tags = tags
+        self.recipes = recipes
+        self.prefixes = prefixes
+        self.endpoints, self.weights = zip(*(
+            (endpoint, weight) for endpoint, weight, needs_token in MIX
+            if authenticated or not needs_token
+        ))
+
+    def next(self, random, state):
+        """Next call of a client, ``state`` keeps its toggled recipes."""
+        endpoint, = random.choices(self.endpoints, self.weights)
+        method, path = 'GET', None
+        if endpoint == 'recipe_list':
+            path = '/api/recipes/?limit=6'
+            if self.tags:
+                tags = random.sample(
+                    self.tags, random.randint(1, min(2, len(self.tags)))
+                )
+                path += ''.join(f'&tags={slug}' for slug in tags)
+        elif endpoint == 'recipe_detail':
+            path = f'/api/recipes/{random.choice(self.recipes)}/'
+        elif endpoint == 'ingredient_search':
+            prefix = quote(random.choice(self.prefixes))
+            path = f'/api/ingredients/?name={prefix}'
+        elif endpoint == 'subscriptions':
+            path = '/api/users/subscriptions/?recipes_limit=3'
+        elif endpoint == 'download_shopping_cart':
+            path = '/api/recipes/download_shopping_cart/'
+        else:
+            action = endpoint[:-len('_toggle')]
+            recipe = random.choice(self.recipes)
+            toggled = state[action]
+            method = 'DELETE' if recipe in toggled else 'POST'
+            toggled.symmetric_difference_update({recipe})
+            path = f'/api/recipes/{recipe}/{action}/'
+        return {
+            'endpoint': endpoint,
+            'method': method,
+            'path': path,
+            'auth': endpoint in AUTH_ENDPOINTS,
+        }
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест: взвешенная смесь запросов API или запись '
+            'из файла JSONL, запросы в секунду и p50/p95/p99 по эндпоинтам')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', type=Target, default=Target('http://127.0.0.1:8000'),
+            help='Адрес сервера, http://host:port'
+        )
+        parser.add_argument(
+            '--token', dest='tokens', action='append', default=[],
+            help='Токен пользователя, можно указать несколько'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=16,
+            help='Число одновременных клиентов'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=30.0,
+            help='Длительность теста в секундах'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно случайной смеси запросов'
+        )
+        parser.add_argument(
+            '--record', help='Записать выполненные запросы в файл JSONL'
+        )
+        parser.add_argument(
+            '--replay', help='Повторить запросы из файла JSONL'
+        )
+        parser.add_argument(
+            '--save', help='Сохранить результаты в файл JSON'
+        )
+        parser.add_argument(
+            '--compare', help='Сравнить с результатами из файла JSON'
+        )
+
+    def handle(self, *args, url, tokens, concurrency, duration, seed,
+               record, replay, save, compare, **options):
+        if concurrency < 1:
+            raise CommandError('Нужен хотя бы один клиент')
+        if replay:
+            streams = self.replayed(replay, concurrency)
+        else:
+            mix = self.mix(url, tokens)
+            streams = [
+                self.generated(mix, Random(seed + number))
+                for number in range(concurrency)
+            ]
+        started = perf_counter()
+        deadline = started + duration
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(
+                lambda number: self.client(
+                    url, streams[number], tokens, number, deadline
+                ),
+                range(len(streams))
+            ))
+        elapsed = perf_counter() - started
+        summary = self.summary(results, elapsed)
+        self.report(summary)
+        if record:
+            self.record(record, results)
+        if save:
+            with open(save, 'w', encoding='utf-8') as file:
+                json.dump(summary, file, ensure_ascii=False, indent=2)
+        if compare:
+            self.compare(compare, summary)
+
+    def mix(self, target, tokens):
+        connection = target.connect()
+        try:
+            tags = [tag['slug'] for tag in self.fetch(
+                target, connection, '/api/tags/'
+            )]
+            recipes = [recipe['id'] for recipe in self.fetch(
+                target, connection, f'/api/recipes/?limit={SAMPLE_RECIPES}'
+            )['results']]
+            names = self.fetch(target, connection, '/api/ingredients/')
+        finally:
+            connection.close()
+        if not recipes:
+            raise CommandError(f'На {target.name} нет рецептов')
+        prefixes = sorted({
+            ingredient['name'][:PREFIX_LENGTH] for ingredient in names
+        })[:SAMPLE_PREFIXES] or ['а']
+        return TrafficMix(tags, recipes, prefixes, bool(tokens))
+
+    @staticmethod
+    def fetch(target, connection, path):
+        try:
+            status, body = target.get(connection, path, {})
+        except (OSError, HTTPException) as error:
+            raise CommandError(f'{target.name} недоступен: {error}')
+        if status != 200:
+            raise CommandError(f'{path}: {target.name} ответил {status}')
+        return json.loads(body)
+
+    @staticmethod
+    def generated(mix, random):
+        state = defaultdict(set)
+        while True:
+            yield mix.next(random, state)
+
+    @staticmethod
+    def replayed(path, concurrency):
+        """Recorded calls, each client keeps the calls of its token."""
+        streams = [[] for _ in range(concurrency)]
+        try:
+            with open(path, encoding='utf-8') as file:
+                calls = [json.loads(line) for line in file if line.strip()]
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        for number, call in enumerate(calls):
+            streams[call.get('client', number) % concurrency].append(call)
+        return streams
+
+    @staticmethod
+    def client(target, calls, tokens, number, deadline):
+        """Calls of one keep-alive client, until the deadline."""
+        token = tokens[number % len(tokens)] if tokens else None
+        connection = target.connect()
+        done = []
+        for call in calls:
+            started = perf_counter()
+            if started >= deadline:
+                break
+            headers = {}
+            if call.get('auth'):
+                if token is None:
+                    continue
+                headers['Authorization'] = f'Token {token}'
+            try:
+                status, _ = target.request(
+                    connection, call['method'], call['path'], headers
+                )
+            except (OSError, HTTPException):
+                connection.close()
+                status = None
+            done.append((started, perf_counter() - started, status, call))
+        connection.close()
+        return done
+
+    @staticmethod
+    def summary(results, elapsed):
+        latencies = defaultdict(list)
+        errors, rejected = defaultdict(int), defaultdict(int)
+        for done in results:
+            for _, latency, status, call in done:
+                endpoint = call['endpoint']
+                if status is None or status >= 500:
+                    errors[endpoint] += 1
+                    continue
+                if status >= 400:
+                    rejected[endpoint] += 1
+                latencies[endpoint].append(latency)
+                latencies['total'].append(latency)
+        errors['total'] = sum(errors.values())
+        rejected['total'] = sum(rejected.values())
+        summary = {}
+        for endpoint in sorted(latencies.keys() | errors.keys()):
+            values = sorted(latencies[endpoint])
+            summary[endpoint] = {
+                'requests': len(values),
+                'rps': len(values) / elapsed,
+                'p50': percentile(values, 0.5) * 1000,
+                'p95': percentile(values, 0.95) * 1000,
+                'p99': percentile(values, 0.99) * 1000,
+                'rejected': rejected[endpoint],
+                'errors': errors[endpoint],
+            }
+        return summary
+
+    def report(self, summary):
+        self.stdout.write(
+            f'{"endpoint":<24}{"requests":>9}{"rps":>9}{"p50 ms":>9}'
+            f'{"p95 ms":>9}{"p99 ms":>9}{"4xx":>6}{"errors":>8}'
+        )
+        for endpoint, row in summary.items():
+            self.stdout.write(
+                f'{endpoint:<24}{row["requests"]:>9}{row["rps"]:>9.1f}'
+                f'{row["p50"]:>9.1f}{row["p95"]:>9.1f}{row["p99"]:>9.1f}'
+                f'{row["rejected"]:>6}{row["errors"]:>8}'
+            )
+
+    @staticmethod
+    def record(path, results):
+        calls = sorted((
+            (started, dict(call, client=number))
+            for number, done in enumerate(results)
+            for started, _, _, call in done
+        ), key=lambda item: item[0])
+        with open(path, 'w', encoding='utf-8') as file:
+            for _, call in calls:
+                file.write(json.dumps(call, ensure_ascii=False) + '\n')
+
+    def compare(self, path, summary):
+        try:
+            with open(path, encoding='utf-8') as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        self.stdout.write(f'Изменение относительно {path}:')
+        for endpoint, row in summary.items():
+            before = baseline.get(endpoint)
+            if not before:
+                continue
+            changes = ', '.join(
+                f'{metric} {(row[metric] / before[metric] - 1) * 100:+.1f}%'
+                for metric in ('rps', 'p50', 'p95', 'p99')
+                if before[metric]
+            )
+            self.stdout.write(f'{endpoint:<24}{changes}')
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from threading import Lock
+
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from asgiref.sync import sync_to_async
+
+from foodgram.constants import VIEW_POOL_WORKERS
+
+
+def run_view(view, request, *args, **kwargs):
+    """Call a sync view and render its response in the current thread."""
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+class ViewPool:
+    """Bounded threads running the sync API views under ASGI.
+
+    Django 3.2 runs every sync view on a single shared thread under ASGI,
+    so one slow query holds all requests of the worker. Views offloaded
+    here run in parallel, and the number of threads caps the database
+    connections a worker can open.
+    """
+
+    def __init__(self, workers=VIEW_POOL_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._lock = Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix='views'
+                )
+            return self._executor
+
+    def offload(self, view):
+        """Async view calling ``view`` on the pool."""
+
+        @wraps(view)
+        async def offloaded(request, *args, **kwargs):
+            return await sync_to_async(
+                partial(run_view, view),
+                thread_sensitive=False,
+                executor=self.executor
+            )(request, *args, **kwargs)
+
+        return offloaded
+
+    def offload_patterns(self, patterns, names):
+        """URL patterns with the views of the given names offloaded."""
+        return [
+            URLPattern(
+                pattern.pattern, self.offload(pattern.callback),
+                pattern.default_args, pattern.name
+            ) if pattern.name in names else pattern
+            for pattern in patterns
+        ]
+
+
+view_pool = ViewPool()
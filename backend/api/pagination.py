@@ -1,7 +1,187 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+
+
+def following(ordering, position):
+    """Rows after ``position`` in ``ordering`` as a row comparison."""
+    condition, equal = Q(), Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def reversed_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+def is_unique(model, name):
+    if name == 'pk':
+        return True
+    try:
+        return model._meta.get_field(name).unique
+    except FieldDoesNotExist:
+        return False
+
+
+def estimate_count(queryset):
+    """Row estimate of the planner instead of a COUNT(*) scan."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return plan[0]['Plan']['Plan Rows']
+
+
+class KeysetPagination(CursorPagination):
+    """Opaque cursors over the queryset ordering, without COUNT and OFFSET.
+
+    The position of a cursor holds the values of every ordering field of
+    the row it follows. The last field has to be unique, so pages are cut
+    by a row comparison and never need an offset.
+    """
+
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+    unsupported_ordering_message = (
+        'Постраничный вывод по курсору недоступен для этой сортировки'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.count = estimate_count(queryset.order_by())
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        position, reverse = None, False
+        if self.cursor is not None:
+            position = self.decode_position(self.cursor.position)
+            reverse = self.cursor.reverse
+        ordering = (reversed_ordering(self.ordering) if reverse
+                    else self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(following(ordering, position))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = (tuple(queryset.query.order_by)
+                    or tuple(queryset.model._meta.ordering))
+        if not (all(isinstance(field, str) and '__' not in field
+                    for field in ordering)
+                and ordering
+                and is_unique(queryset.model, ordering[-1].lstrip('-'))):
+            raise ValidationError(
+                {'ordering': self.unsupported_ordering_message}
+            )
+        return ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            getattr(instance, field.lstrip('-')) for field in ordering
+        ], cls=DjangoJSONEncoder)
+
+    def decode_position(self, position):
+        if position is None:
+            return None
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=self._get_position_from_instance(
+                self.page[-1], self.ordering
+            )
+        ))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True,
+            position=self._get_position_from_instance(
+                self.page[0], self.ordering
+            )
+        ))
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
 
 
 class LimitPagesPagination(PageNumberPagination):
-    """Redefining the field name."""
+    """Redefining the field name.
+
+    ``?pagination=cursor`` switches to keyset pages, the following pages
+    are requested by the ``cursor`` of the ``next`` and ``previous`` links.
+    When a search had more matches than it returns, ``search_limit`` tells
+    how many were kept.
+    """
 
     page_size_query_param = 'limit'
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.search_limit = getattr(request, 'search_limit', None)
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.keyset_class.cursor_query_param
+                in request.query_params):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            response = self.keyset.get_paginated_response(data)
+        else:
+            response = super().get_paginated_response(data)
+        if self.search_limit is not None:
+            response.data['search_limit'] = self.search_limit
+        return response
@@ -0,0 +1,44 @@
+from django.utils.functional import cached_property
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+
+class ViewerRelations:
+    """Ids of the authors, favorites and cart recipes of one viewer.
+
+    Each set is loaded by a single query on first use, serializers answer
+    the per-object flags from memory afterwards.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _ids(self, queryset, field):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def following(self):
+        return self._ids(Follow.objects, 'author_id')
+
+    @cached_property
+    def favorited(self):
+        return self._ids(Favorite.objects, 'recipe_id')
+
+    @cached_property
+    def in_shopping_cart(self):
+        return self._ids(ShoppingCart.objects, 'recipe_id')
+
+
+def get_viewer_relations(request):
+    """Relations of the request user, shared by the whole request."""
+    http_request = getattr(request, '_request', request)
+    relations = getattr(http_request, 'viewer_relations', None)
+    if relations is None or relations.user != request.user:
+        relations = ViewerRelations(request.user)
+        http_request.viewer_relations = relations
+    return relations
@@ -0,0 +1,303 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict, namedtuple
+from math import log
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from foodgram.constants import (BM25_B, BM25_K1, PANTRY_RESULTS_LIMIT,
+                                SEARCH_CONFIG, SEARCH_NAME_WEIGHT,
+                                SEARCH_RESULTS_LIMIT, TRIGRAM_SIMILARITY,
+                                TRIGRAM_SIZE)
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+
+from .cache import VersionedSnapshot
+
+IngredientNames = namedtuple(
+    'IngredientNames', ('names', 'documents', 'sizes', 'trigrams')
+)
+
+WORD = re.compile(r'\w\w+')
+
+
+def trigrams(text):
+    """Trigrams of every word padded the way pg_trgm does it."""
+    found = set()
+    for word in text.split():
+        padded = f'  {word} '
+        found.update(
+            padded[start:start + TRIGRAM_SIZE]
+            for start in range(len(padded) - TRIGRAM_SIZE + 1)
+        )
+    return found
+
+
+class IngredientIndex(VersionedSnapshot):
+    """Ingredient names kept in memory for autocomplete.
+
+    Prefix matches come from a sorted array by binary search, names with
+    typos are found by trigram similarity when prefixes are not enough.
+    """
+
+    def build(self):
+        names, documents, sizes = [], {}, {}
+        index = defaultdict(list)
+        for ingredient in Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'):
+            name = ingredient['name'].casefold()
+            names.append((name, ingredient['id']))
+            documents[ingredient['id']] = ingredient
+            name_trigrams = trigrams(name)
+            sizes[ingredient['id']] = len(name_trigrams)
+            for trigram in name_trigrams:
+                index[trigram].append(ingredient['id'])
+        names.sort()
+        return IngredientNames(names, documents, sizes, index)
+
+    @staticmethod
+    def _prefix(names, query, limit):
+        position = bisect_left(names, (query,))
+        found = []
+        while (position < len(names) and len(found) < limit
+               and names[position][0].startswith(query)):
+            found.append(names[position][1])
+            position += 1
+        return found
+
+    @staticmethod
+    def _similar(sizes, index, query, limit, exclude):
+        query_trigrams = trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(index.get(trigram, ()))
+        scored = []
+        for pk, common in shared.items():
+            similarity = common / len(query_trigrams)
+            if similarity >= TRIGRAM_SIMILARITY and pk not in exclude:
+                overlap = common / (len(query_trigrams) + sizes[pk] - common)
+                scored.append((-similarity, -overlap, pk))
+        scored.sort()
+        return [pk for *_, pk in scored[:limit]]
+
+    def search(self, query, limit):
+        """Ingredients ranked by prefix match first, then by similarity."""
+        query = ' '.join(query.casefold().split())
+        if not query or limit <= 0:
+            return []
+        index = self.get()
+        found = self._prefix(index.names, query, limit)
+        if len(found) < limit:
+            found += self._similar(
+                index.sizes, index.trigrams, query,
+                limit - len(found), set(found)
+            )
+        return [index.documents[pk] for pk in found]
+
+
+class RecipeTerms:
+    """Posting lists of the recipe words with the document lengths.
+
+    A posting list is replaced on change, never mutated, so searches can
+    read it while a recipe is being indexed.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.lengths = {}
+        self.documents = {}
+        self.total_length = 0
+
+    def add(self, pk, name, text):
+        self.remove(pk)
+        frequencies = Counter(words(text))
+        for word in words(name):
+            frequencies[word] += SEARCH_NAME_WEIGHT
+        self.documents[pk] = tuple(frequencies)
+        self.lengths[pk] = sum(frequencies.values())
+        self.total_length += self.lengths[pk]
+        for word, frequency in frequencies.items():
+            self.postings[word] = {
+                **self.postings.get(word, {}), pk: frequency
+            }
+
+    def remove(self, pk):
+        for word in self.documents.pop(pk, ()):
+            posting = {
+                key: frequency
+                for key, frequency in self.postings[word].items()
+                if key != pk
+            }
+            if posting:
+                self.postings[word] = posting
+            else:
+                del self.postings[word]
+        self.total_length -= self.lengths.pop(pk, 0)
+
+
+def words(text):
+    return WORD.findall(text.casefold())
+
+
+class RecipeSearchIndex(VersionedSnapshot):
+    """In-process inverted index over recipe names and texts, BM25 ranked.
+
+    Used when the database has no full-text search of its own. Recipes
+    saved or deleted in this process are reindexed one by one, the TTL
+    picks up the changes of other processes.
+    """
+
+    def build(self):
+        terms = RecipeTerms()
+        for pk, name, text in Recipe.objects.values_list(
+                'pk', 'name', 'text').iterator():
+            terms.add(pk, name, text)
+        return terms
+
+    def update(self, pk, name, text):
+        self.apply(lambda terms: terms.add(pk, name, text))
+
+    def remove(self, pk):
+        self.apply(lambda terms: terms.remove(pk))
+
+    def search(self, query, limit):
+        """Ids of the recipes having every query word, best first.
+
+        Equal scores go newest first, as on PostgreSQL.
+        """
+        query_words = set(words(query))
+        if not query_words or limit <= 0:
+            return []
+        terms = self.get()
+        postings = sorted(
+            (terms.postings.get(word, {}) for word in query_words), key=len
+        )
+        if not postings[0] or not terms.lengths:
+            return []
+        found = set(postings[0]).intersection(*postings[1:])
+        documents = len(terms.lengths)
+        average_length = terms.total_length / documents
+        scores = Counter()
+        for posting in postings:
+            weight = log(
+                1 + (documents - len(posting) + 0.5) / (len(posting) + 0.5)
+            )
+            for pk in found:
+                frequency = posting[pk]
+                length = terms.lengths.get(pk, average_length)
+                norm = 1 - BM25_B + BM25_B * length / average_length
+                scores[pk] += weight * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * norm
+                )
+        return [pk for _, pk in heapq.nlargest(
+            limit, ((score, pk) for pk, score in scores.items())
+        )]
+
+
+class RecipeIngredients:
+    """Sorted arrays of recipe ids by ingredient, with the recipe contents.
+
+    Like the posting lists of ``RecipeTerms`` an array is replaced on
+    change, never mutated.
+    """
+
+    def __init__(self, recipes):
+        self.recipes = {}
+        self.postings = {}
+        postings = defaultdict(list)
+        for pk in sorted(recipes):
+            self.recipes[pk] = tuple(set(recipes[pk]))
+            for ingredient in self.recipes[pk]:
+                postings[ingredient].append(pk)
+        for ingredient, recipe_ids in postings.items():
+            self.postings[ingredient] = array('q', recipe_ids)
+
+    def add(self, pk, ingredients):
+        self.remove(pk)
+        self.recipes[pk] = tuple(set(ingredients))
+        for ingredient in self.recipes[pk]:
+            posting = array('q', self.postings.get(ingredient, ()))
+            insort(posting, pk)
+            self.postings[ingredient] = posting
+
+    def remove(self, pk):
+        for ingredient in self.recipes.pop(pk, ()):
+            posting = array('q', self.postings[ingredient])
+            del posting[bisect_left(posting, pk)]
+            if posting:
+                self.postings[ingredient] = posting
+            else:
+                del self.postings[ingredient]
+
+
+class PantryIndex(VersionedSnapshot):
+    """Ingredient to recipes inverted index for "what can I cook".
+
+    Recipes written through the API are reindexed one by one, the TTL
+    picks up the changes of other processes and of the admin.
+    """
+
+    def build(self):
+        recipes = defaultdict(list)
+        for recipe_id, ingredient_id in IngredientRecipe.objects.values_list(
+                'recipe_id', 'ingredient_id').iterator():
+            recipes[recipe_id].append(ingredient_id)
+        return RecipeIngredients(recipes)
+
+    def update(self, pk, ingredients):
+        self.apply(lambda index: index.add(pk, ingredients))
+
+    def remove(self, pk):
+        self.apply(lambda index: index.remove(pk))
+
+    def match(self, pantry, max_missing=None, limit=PANTRY_RESULTS_LIMIT):
+        """Ids of the recipes best covered by the ``pantry`` ingredients.
+
+        Recipes are ranked by the share of their ingredients found in the
+        pantry, then by the number of missing ones, newest first on ties.
+        """
+        index = self.get()
+        held = Counter()
+        for ingredient in set(pantry):
+            held.update(index.postings.get(ingredient, ()))
+        scored = []
+        for pk, count in held.items():
+            ingredients = index.recipes.get(pk)
+            if not ingredients:
+                continue
+            missing = max(len(ingredients) - count, 0)
+            if max_missing is None or missing <= max_missing:
+                scored.append((count / len(ingredients), -missing, pk))
+        return [pk for *_, pk in heapq.nlargest(limit, scored)]
+
+
+def search_recipes(queryset, query):
+    """Recipes matching every word of ``query`` ordered by relevance.
+
+    The relevance is annotated as ``search_rank``. The in-process index
+    only returns the best ``SEARCH_RESULTS_LIMIT`` recipes, the second
+    value tells whether more of them matched.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        # ts_rank is a real, as a double it compares equal to its value
+        # decoded from a cursor.
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=Cast(
+                SearchRank(F('search_vector'), search_query), FloatField()
+            )
+        ).order_by('-search_rank', '-id'), False
+    found = recipe_search.search(query, SEARCH_RESULTS_LIMIT + 1)
+    if not found:
+        return queryset.none(), False
+    return (queryset.ranked(found[:SEARCH_RESULTS_LIMIT]),
+            len(found) > SEARCH_RESULTS_LIMIT)
+
+
+ingredient_index = IngredientIndex()
+recipe_search = RecipeSearchIndex()
+pantry_index = PantryIndex()
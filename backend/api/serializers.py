@@ -1,4 +1,8 @@
+from collections import OrderedDict, defaultdict
+
+from django.core.files.base import ContentFile
 from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
 
 from djoser.serializers import (
     UserCreateSerializer as DjoserCreateUserSerializer)
@@ -6,14 +10,43 @@ from djoser.serializers import UserSerializer as DjoserUserSerialiser
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from rest_framework.serializers import (ModelSerializer,
+from rest_framework.serializers import (ListSerializer, ModelSerializer,
                                         PrimaryKeyRelatedField,
                                         SerializerMethodField)
 
-from foodgram.constants import MIN_INGREDIENT
-from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from foodgram.constants import (MIN_INGREDIENT, PANTRY_MAX_INGREDIENTS,
+                                UPLOAD_MAX_SIZE)
+from recipes.models import (ImageUpload, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCartIngredient, Tag)
 from users.models import User
 
+from .cache import recipe_documents
+from .fields import UploadedImage, UploadedImageField
+from .relations import get_viewer_relations
+from .search import pantry_index
+
+
+def absolute_url(request, url):
+    if url and request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def recipe_images(recipe, request=None):
+    """Rendition URLs, the original stands in until they are made."""
+    if not recipe.image:
+        return None
+    ready = recipe.renditions_ready
+    images = {
+        'thumbnail': recipe.image_thumbnail if ready else recipe.image,
+        'webp': recipe.image_webp if ready else recipe.image,
+        'jpeg': recipe.image_jpeg if ready else recipe.image,
+    }
+    return {
+        name: absolute_url(request, image.url)
+        for name, image in images.items()
+    }
+
 
 class UserCreateSerializer(DjoserCreateUserSerializer):
 
@@ -37,9 +70,26 @@ class UserSerializer(DjoserUserSerialiser):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return (user.is_authenticated
-                and user.follower.filter(author=obj).exists())
+        request = self.context.get('request')
+        return obj.pk in get_viewer_relations(request).following
+
+
+class SubscriptionsSerializer(ListSerializer):
+    """Loads the recipes of the whole page of authors at once."""
+
+    def to_representation(self, data):
+        authors = list(data.all() if isinstance(data, Manager) else data)
+        limit = self.child.get_recipes_limit()
+        if limit is None:
+            prefetch_related_objects(authors, 'recipes')
+            return super().to_representation(authors)
+        latest_recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_by_authors(
+                [author.pk for author in authors], limit):
+            latest_recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = latest_recipes[author.pk]
+        return super().to_representation(authors)
 
 
 class SubscribeListSerializer(UserSerializer):
@@ -53,6 +103,7 @@ class SubscribeListSerializer(UserSerializer):
             'is_subscribed', 'recipes', 'recipes_count',
         )
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
+        list_serializer_class = SubscriptionsSerializer
 
     def validate(self, data):
         author = self.instance
@@ -63,23 +114,46 @@ class SubscribeListSerializer(UserSerializer):
             raise ValidationError('Нельзя подписаться на самого себя')
         return data
 
+    def get_recipes_limit(self):
+        """``recipes_limit`` of the request, None when it is not given."""
+        limit = self.context.get('request').GET.get('recipes_limit')
+        if not limit:
+            return None
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'Нужно указать целое число не меньше 0'}
+            )
+        return limit
+
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.recipes.all()
-        limit = request.GET.get('recipes_limit')
-        if limit:
-            recipes = recipes[: int(limit)]
+        recipes = getattr(obj, 'latest_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            limit = self.get_recipes_limit()
+            if limit is not None:
+                recipes = recipes[:limit]
         return ShortViewRecipeSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
 
 class ShortViewRecipeSerializer(ModelSerializer):
 
+    images = SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+    def get_images(self, obj):
+        return recipe_images(obj, self.context.get('request'))
 
 
 class TagSerializer(ModelSerializer):
@@ -96,6 +170,56 @@ class IngredientSerializer(ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
+class PantrySerializer(serializers.Serializer):
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=PANTRY_MAX_INGREDIENTS
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+
+class ImageUploadSerializer(ModelSerializer):
+
+    file = serializers.FileField(write_only=True, required=False)
+    size = serializers.IntegerField(
+        min_value=1, max_value=UPLOAD_MAX_SIZE, required=False
+    )
+
+    class Meta:
+        model = ImageUpload
+        fields = ('token', 'file', 'size', 'received')
+        read_only_fields = ('token', 'received')
+
+    def validate(self, data):
+        file = data.get('file')
+        if file is not None:
+            if file.size > UPLOAD_MAX_SIZE:
+                raise ValidationError(
+                    {'file': f'Файл не должен быть больше {UPLOAD_MAX_SIZE} '
+                             'байт'}
+                )
+            data['size'] = file.size
+        elif 'size' not in data:
+            raise ValidationError('Нужно передать файл или размер загрузки')
+        return data
+
+    def create(self, validated_data):
+        file = validated_data.get('file')
+        upload = ImageUpload(
+            user=self.context.get('request').user,
+            size=validated_data['size']
+        )
+        upload.file.save(
+            str(upload.token), file or ContentFile(b''), save=False
+        )
+        if file is not None:
+            upload.received = upload.size
+        upload.save()
+        return upload
+
+
 class RecipeIngredientSerializer(ModelSerializer):
 
     id = serializers.IntegerField(source='ingredient.id')
@@ -109,6 +233,17 @@ class RecipeIngredientSerializer(ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class RecipeListSerializer(ListSerializer):
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        missing = [
+            recipe for recipe in recipes if recipe.pk not in recipe_documents
+        ]
+        prefetch_related_objects(missing, *self.child.document_prefetch)
+        return super().to_representation(recipes)
+
+
 class RecipeReadSerializer(ModelSerializer):
 
     author = UserSerializer(read_only=True)
@@ -116,17 +251,82 @@ class RecipeReadSerializer(ModelSerializer):
         read_only=True, many=True, source='ingredients_recipe'
     )
     tags = TagSerializer(many=True, read_only=True)
-    is_favorited = serializers.BooleanField(default=False, read_only=True)
-    is_in_shopping_cart = serializers.BooleanField(default=False,
-                                                   read_only=True)
+    is_favorited = SerializerMethodField()
+    is_in_shopping_cart = SerializerMethodField()
     image = Base64ImageField()
+    images = SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'images', 'text',
+            'cooking_time'
+        )
+        list_serializer_class = RecipeListSerializer
+
+    document_prefetch = ('ingredients_recipe__ingredient', 'tags')
+
+    def to_representation(self, instance):
+        document = recipe_documents.get(instance.pk)
+        if document is None:
+            generation = recipe_documents.generation
+            document = self.get_document(instance)
+            recipe_documents.set(
+                instance.pk, document,
+                self.get_dependencies(instance), generation
+            )
+        return self.add_viewer_fields(instance, document)
+
+    def get_is_favorited(self, obj):
+        request = self.context.get('request')
+        return obj.pk in get_viewer_relations(request).favorited
+
+    def get_is_in_shopping_cart(self, obj):
+        request = self.context.get('request')
+        return obj.pk in get_viewer_relations(request).in_shopping_cart
+
+    def get_images(self, obj):
+        return recipe_images(obj)
+
+    def get_document(self, instance):
+        """Build the part of the payload shared by all viewers."""
+        prefetch_related_objects([instance], *self.document_prefetch)
+        document = super().to_representation(instance)
+        del document['author']['is_subscribed']
+        document['is_favorited'] = None
+        document['is_in_shopping_cart'] = None
+        document['image'] = instance.image.url if instance.image else None
+        return document
+
+    @staticmethod
+    def get_dependencies(instance):
+        dependencies = [('recipe', instance.pk), ('user', instance.author_id)]
+        dependencies.extend(('tag', tag.pk) for tag in instance.tags.all())
+        dependencies.extend(
+            ('ingredient', ingredient.ingredient_id)
+            for ingredient in instance.ingredients_recipe.all()
+        )
+        return dependencies
+
+    def add_viewer_fields(self, instance, document):
+        request = self.context.get('request')
+        data = OrderedDict(document)
+        data['author'] = OrderedDict(
+            document['author'],
+            is_subscribed=self.fields['author'].get_is_subscribed(
+                instance.author
+            )
         )
+        data['is_favorited'] = self.get_is_favorited(instance)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(instance)
+        data['image'] = absolute_url(request, data['image'])
+        if data['images']:
+            data['images'] = {
+                name: absolute_url(request, url)
+                for name, url in data['images'].items()
+            }
+        return data
 
 
 class IngredientForRecipeSerializer(ModelSerializer):
@@ -144,7 +344,7 @@ class RecipeCreateSerializer(ModelSerializer):
     ingredients = IngredientForRecipeSerializer(many=True)
     author = UserSerializer(read_only=True)
     tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
-    image = Base64ImageField(required=True)
+    image = UploadedImageField(required=True)
 
     class Meta:
         model = Recipe
@@ -175,11 +375,16 @@ class RecipeCreateSerializer(ModelSerializer):
     def validate(self, data):
         tags = data.get('tags', [])
         ingredients = data.get('ingredients', [])
-        if not data.get('tags', []):
+        # A partial update leaves the omitted fields as they are.
+        required = {
+            field for field in ('tags', 'ingredients', 'text')
+            if not self.partial or field in data
+        }
+        if 'tags' in required and not tags:
             raise ValidationError(
                 'Нельзя создать рецепт без тэгов!'
             )
-        if not data.get('ingredients', []):
+        if 'ingredients' in required and not ingredients:
             raise ValidationError(
                 'Нельзя создать рецепт без ингредиентов!'
             )
@@ -193,7 +398,7 @@ class RecipeCreateSerializer(ModelSerializer):
                 'Нельзя указывать одинаковые теги!'
             )
 
-        if not data['text']:
+        if 'text' in required and not data.get('text'):
             raise ValidationError(
                 'Нельзя создать рецепт без текста!'
             )
@@ -213,6 +418,19 @@ class RecipeCreateSerializer(ModelSerializer):
                 )
             )
         IngredientRecipe.objects.bulk_create(ingredient_list)
+        pk = recipe.pk
+        ingredient_ids = [
+            ingredient.ingredient.pk for ingredient in ingredient_list
+        ]
+        transaction.on_commit(
+            lambda: pantry_index.update(pk, ingredient_ids)
+        )
+
+    @staticmethod
+    def discard_upload(validated_data):
+        image = validated_data.get('image')
+        if isinstance(image, UploadedImage):
+            image.discard()
 
     @transaction.atomic
     def create(self, validated_data):
@@ -225,17 +443,62 @@ class RecipeCreateSerializer(ModelSerializer):
         self.add_ingredients(ingredients, recipe)
         recipe.tags.set(tags)
         recipe.save()
+        self.discard_upload(validated_data)
         return recipe
 
+    @staticmethod
+    def same_image(stored, image):
+        """Whether ``image`` has the content of the stored file."""
+        return stored.name == stored.storage.hashed_name(
+            stored.field.generate_filename(stored.instance, image.name),
+            image
+        )
+
+    @staticmethod
+    def update_tags(recipe, tags):
+        current = set(recipe.tags.values_list('pk', flat=True))
+        new = {tag.pk for tag in tags}
+        recipe.tags.remove(*current - new)
+        recipe.tags.add(*new - current)
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        old_amounts = IngredientRecipe.objects.sync(recipe, amounts)
+        if old_amounts != amounts:
+            ShoppingCartIngredient.objects.change_recipe(
+                recipe, old_amounts, amounts
+            )
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-        instance.tags.clear()
-        instance.ingredients.clear()
-        self.add_ingredients(ingredients, instance)
-        instance.tags.set(tags)
-        return super().update(instance, validated_data)
+        """Write only what differs from the stored recipe.
+
+        Tags and ingredients are diffed row by row, the recipe is saved
+        with just the changed fields, or not at all.
+        """
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if tags is not None:
+            self.update_tags(instance, tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        changed = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        if 'image' in changed and self.same_image(
+                instance.image, validated_data['image']):
+            changed.remove('image')
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed:
+            instance.save(update_fields=changed)
+        self.discard_upload(validated_data)
+        return instance
 
     def to_representation(self, instance):
         return RecipeReadSerializer(instance, context=self.context).data
@@ -0,0 +1,187 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from recipes.images import rendition_pool, renditions_ready
+from recipes.models import (FeedEntry, ImageUpload, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingCart, Tag,
+                            ingredients_changed)
+from users.models import User
+
+from .cache import recipe_documents, token_cache
+from .search import ingredient_index, pantry_index, recipe_search
+from .snapshots import ingredient_snapshot, tag_masks, tag_snapshot
+from .utils import (bump_cart_versions, bump_ingredients_version,
+                    bump_recipe_carts)
+
+SEARCH_FIELDS = {'name', 'text'}
+
+
+def invalidate_document(model_name, pk):
+    """Drop the recipe documents built from an object, now and on commit.
+
+    The second pass drops a copy a concurrent request may have cached
+    from the rows as they were before the commit.
+    """
+    recipe_documents.invalidate(model_name, pk)
+    transaction.on_commit(
+        lambda: recipe_documents.invalidate(model_name, pk)
+    )
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=User)
+def invalidate_recipe_documents(sender, instance, **kwargs):
+    invalidate_document(instance._meta.model_name, instance.pk)
+
+
+@receiver(renditions_ready, sender=Recipe)
+def invalidate_recipe_images(sender, recipe_id, **kwargs):
+    invalidate_document('recipe', recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def queue_renditions(sender, instance, **kwargs):
+    if instance.image and not instance.renditions_ready:
+        transaction.on_commit(lambda: rendition_pool.submit(instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & update_fields:
+        return
+    Recipe.objects.filter(pk=instance.pk).update_search_vectors()
+    pk, name, text = instance.pk, instance.name, instance.text
+    transaction.on_commit(lambda: recipe_search.update(pk, name, text))
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: recipe_search.remove(pk))
+    transaction.on_commit(lambda: pantry_index.remove(pk))
+
+
+@receiver(post_save, sender=Recipe)
+def push_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.push(instance)
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    invalidate_document('recipe', instance.recipe_id)
+
+
+@receiver(ingredients_changed, sender=Recipe)
+def refresh_recipe_ingredients(sender, recipe_id, ingredient_ids, added,
+                               updated, removed, **kwargs):
+    # Deleted rows are reported by their own post_delete.
+    if added or updated:
+        invalidate_document('recipe', recipe_id)
+        transaction.on_commit(lambda: bump_recipe_carts([recipe_id]))
+    if added or removed:
+        transaction.on_commit(
+            lambda: pantry_index.update(recipe_id, ingredient_ids)
+        )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_recipe_relations(sender, instance, action, model, pk_set,
+                                **kwargs):
+    if not action.startswith('post_'):
+        return
+    invalidate_document(instance._meta.model_name, instance.pk)
+    for pk in pk_set or ():
+        invalidate_document(model._meta.model_name, pk)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_catalog(sender, **kwargs):
+    ingredient_index.invalidate()
+    ingredient_snapshot.invalidate()
+    pantry_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag_catalog(sender, **kwargs):
+    tag_snapshot.invalidate()
+    tag_masks.invalidate()
+
+
+@receiver(post_delete, sender=Tag)
+def clear_tag_bit(sender, instance, **kwargs):
+    if instance.bit is not None:
+        Recipe.objects.remove_tag_mask(instance.mask)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tag_masks(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_clear':
+        if reverse:
+            Recipe.objects.remove_tag_mask(instance.mask)
+        else:
+            instance.tag_mask = 0
+            Recipe.objects.filter(pk=instance.pk).update(tag_mask=0)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    if reverse:
+        recipes, mask = Recipe.objects.filter(pk__in=pk_set), instance.mask
+    else:
+        recipes, mask = (
+            Recipe.objects.filter(pk=instance.pk), tag_masks.mask(pk_set)
+        )
+    if action == 'post_add':
+        recipes.add_tag_mask(mask)
+        if not reverse:
+            instance.tag_mask |= mask
+    else:
+        recipes.remove_tag_mask(mask)
+        if not reverse:
+            instance.tag_mask &= ~mask
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_shopping_list(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_cart_versions([instance.user_id]))
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def invalidate_recipe_shopping_lists(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_recipe_carts([instance.recipe_id]))
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_shopping_lists(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        transaction.on_commit(bump_ingredients_version)
+    else:
+        transaction.on_commit(lambda: bump_recipe_carts([instance.pk]))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_names(sender, **kwargs):
+    transaction.on_commit(bump_ingredients_version)
+
+
+@receiver(post_delete, sender=ImageUpload)
+def delete_upload_file(sender, instance, **kwargs):
+    instance.file.delete(save=False)
+
+
+@receiver(post_delete, sender=Token)
+def revoke_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver((post_save, post_delete), sender=User)
+def revoke_user_tokens(sender, instance, **kwargs):
+    token_cache.revoke_user(instance.pk)
@@ -0,0 +1,129 @@
+import gzip
+from collections import namedtuple
+from hashlib import sha256
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import Ingredient, Tag
+
+from .cache import VersionedSnapshot
+from .serializers import IngredientSerializer, TagSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RenderedCatalog = namedtuple('RenderedCatalog', ('etag', 'bodies'))
+TagMasks = namedtuple('TagMasks', ('by_pk', 'by_slug'))
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        encoding, *params = (part.strip() for part in item.split(';'))
+        if 'q=0' not in params and 'q=0.0' not in params:
+            encodings.add(encoding.lower())
+    return encodings
+
+
+def etag_matches(request, etag):
+    """Whether If-None-Match names any encoding of the given entity."""
+    header = request.META.get('HTTP_IF_NONE_MATCH', '').strip()
+    if header == '*':
+        return True
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag.strip('"').split('-')[0] == etag:
+            return True
+    return False
+
+
+class CatalogSnapshot(VersionedSnapshot):
+    """Whole list response of a catalog rendered once per data version.
+
+    The JSON body is kept together with its gzip and, when the ``brotli``
+    package is installed, brotli variants. The ETag is derived from the
+    content, so every process produces the same one.
+    """
+
+    def __init__(self, queryset, serializer_class):
+        super().__init__()
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+
+    def build(self):
+        data = self.serializer_class(self.queryset.all(), many=True).data
+        body = JSONRenderer().render(data)
+        bodies = {'identity': body, 'gzip': gzip.compress(body)}
+        if brotli is not None:
+            bodies['br'] = brotli.compress(body)
+        return RenderedCatalog(sha256(body).hexdigest(), bodies)
+
+    def response(self, request):
+        catalog = self.get()
+        encoding = 'identity'
+        accepted = accepted_encodings(request)
+        for candidate in ('br', 'gzip'):
+            if candidate in catalog.bodies and candidate in accepted:
+                encoding = candidate
+                break
+        etag = (f'"{catalog.etag}"' if encoding == 'identity'
+                else f'"{catalog.etag}-{encoding}"')
+        if etag_matches(request, catalog.etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                catalog.bodies[encoding], content_type='application/json'
+            )
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class CatalogSnapshotMixin:
+    """Serves the unfiltered JSON list from ``snapshot``."""
+
+    snapshot = None
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return self.snapshot.response(request)
+
+
+class TagMaskSnapshot(VersionedSnapshot):
+    """Bits of ``Recipe.tag_mask`` by tag id and slug."""
+
+    def build(self):
+        masks = TagMasks({}, {})
+        for pk, slug, bit in Tag.objects.exclude(bit=None).values_list(
+                'pk', 'slug', 'bit'):
+            masks.by_pk[pk] = masks.by_slug[slug] = 1 << bit
+        return masks
+
+    def mask(self, pks):
+        """Mask of the given tag ids."""
+        masks = self.get()
+        if not set(pks) <= masks.by_pk.keys():
+            self.invalidate()
+            masks = self.get()
+        mask = 0
+        for pk in pks:
+            mask |= masks.by_pk.get(pk, 0)
+        return mask
+
+
+tag_masks = TagMaskSnapshot()
+tag_snapshot = CatalogSnapshot(Tag.objects.all(), TagSerializer)
+ingredient_snapshot = CatalogSnapshot(
+    Ingredient.objects.all(), IngredientSerializer
+)
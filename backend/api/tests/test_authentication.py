@@ -0,0 +1,50 @@
+from django.test import TestCase
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import CachedTokenAuthentication
+from api.cache import token_cache
+from users.models import User
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assertAuthenticated(self):
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.token.key, token_cache)
+
+    def test_logged_out_token(self):
+        self.assertAuthenticated()
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertNotIn(self.token.key, token_cache)
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivated_user(self):
+        self.assertAuthenticated()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_read_before_revocation(self):
+        generation = token_cache.generation
+        _, token = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key
+        )
+        token_cache.revoke_user(self.user.pk)
+        token_cache.set(self.token.key, token, generation)
+        self.assertNotIn(self.token.key, token_cache)
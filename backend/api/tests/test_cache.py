@@ -0,0 +1,106 @@
+from threading import Event
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from api.cache import RecipeDocumentCache, VersionedSnapshot, recipe_documents
+from recipes.models import Recipe
+from users.models import User
+
+
+class RecipeDocumentCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.documents = RecipeDocumentCache(10, ttl=60)
+
+    def test_expired_document(self):
+        with mock.patch('api.cache.monotonic', return_value=100):
+            self.documents.set(1, 'document', [('recipe', 1)])
+        with mock.patch('api.cache.monotonic', return_value=159):
+            self.assertIn(1, self.documents)
+            self.assertEqual(self.documents.get(1), 'document')
+        with mock.patch('api.cache.monotonic', return_value=160):
+            self.assertNotIn(1, self.documents)
+            self.assertIsNone(self.documents.get(1))
+        self.assertEqual(self.documents.stats()['expirations'], 1)
+        self.assertEqual(self.documents._dependants, {})
+
+    def test_stale_generation_is_not_stored(self):
+        generation = self.documents.generation
+        self.documents.invalidate('recipe', 1)
+        self.documents.set(1, 'document', [('recipe', 1)], generation)
+        self.assertNotIn(1, self.documents)
+        self.assertEqual(self.documents._dependencies, {})
+
+
+class CountingSnapshot(VersionedSnapshot):
+
+    def __init__(self):
+        super().__init__(ttl=60)
+        self.builds = 0
+        self.building = Event()
+        self.release = Event()
+        self.release.set()
+
+    def build(self):
+        self.builds += 1
+        self.building.set()
+        self.release.wait(5)
+        return [self.builds]
+
+
+class VersionedSnapshotTests(SimpleTestCase):
+
+    def setUp(self):
+        self.snapshot = CountingSnapshot()
+        with mock.patch('api.cache.monotonic', return_value=100):
+            self.assertEqual(self.snapshot.get(), [1])
+
+    def test_expired_value_is_served_while_rebuilt(self):
+        self.snapshot.release.clear()
+        self.snapshot.building.clear()
+        with mock.patch('api.cache.monotonic', return_value=160):
+            self.assertEqual(self.snapshot.get(), [1])
+            self.assertTrue(self.snapshot.building.wait(5))
+            self.assertEqual(self.snapshot.get(), [1])
+            self.snapshot.apply(lambda value: value.append('change'))
+            self.snapshot.release.set()
+            with self.snapshot._build_lock:
+                pass
+            self.assertEqual(self.snapshot.get(), [2, 'change'])
+        self.assertEqual(self.snapshot.builds, 2)
+
+    def test_invalidated_value_is_rebuilt_at_once(self):
+        self.snapshot.invalidate()
+        with mock.patch('api.cache.monotonic', return_value=101):
+            self.assertEqual(self.snapshot.get(), [2])
+
+
+class RecipeDocumentInvalidationTests(TestCase):
+
+    def setUp(self):
+        recipe_documents.clear()
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author',
+            first_name='Имя', last_name='Фамилия', password='password'
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание', cooking_time=10,
+            image='recipes/images/recipe.png'
+        )
+
+    # The commit would hand the recipe to the rendition threads, which
+    # would write to the test database while later tests run.
+    @mock.patch('api.signals.rendition_pool')
+    def test_recached_before_commit(self, rendition_pool):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+            self.assertNotIn(self.recipe.pk, recipe_documents)
+            # A concurrent request caches the row as it was before commit.
+            recipe_documents.set(
+                self.recipe.pk, 'stale', [('recipe', self.recipe.pk)],
+                recipe_documents.generation
+            )
+        self.assertNotIn(self.recipe.pk, recipe_documents)
+        rendition_pool.submit.assert_called_once_with(self.recipe.pk)
@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart)
+from users.models import Follow, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch.multiple(
+    'recipes.dataset', DATASET_USERS=30, DATASET_RECIPES=60,
+    DATASET_CHUNK_SIZE=25, DATASET_IMAGES=2
+)
+class GenerateDatasetTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        for number in range(40):
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+
+    def generate(self, seed):
+        """Rows created by the command, which are then deleted."""
+        call_command(
+            'generate_dataset', scale=2, seed=seed, skip_derived=True,
+            stdout=StringIO()
+        )
+        rows = {
+            'users': list(User.objects.order_by('pk').values_list(
+                'pk', 'username', 'first_name', 'last_name'
+            )),
+            'recipes': list(Recipe.objects.order_by('pk').values_list(
+                'pk', 'author', 'name', 'text', 'cooking_time', 'image',
+                'image_webp', 'tag_mask'
+            )),
+            'tags': list(Recipe.tags.through.objects.order_by(
+                'recipe', 'tag'
+            ).values_list('recipe', 'tag')),
+        }
+        for name, model, fields in (
+                ('ingredients', IngredientRecipe,
+                 ('recipe', 'ingredient', 'amount')),
+                ('favorites', Favorite, ('user', 'recipe')),
+                ('carts', ShoppingCart, ('user', 'recipe')),
+                ('follows', Follow, ('user', 'author'))):
+            rows[name] = list(
+                model.objects.order_by(*fields[:2]).values_list(*fields)
+            )
+        User.objects.all().delete()
+        return rows
+
+    def test_same_seed_same_data(self):
+        first = self.generate(seed=1)
+        self.assertEqual(len(first['users']), 60)
+        self.assertEqual(len(first['recipes']), 120)
+        for name in ('tags', 'ingredients', 'favorites', 'carts', 'follows'):
+            self.assertTrue(first[name], name)
+        self.assertEqual(self.generate(seed=1), first)
+        self.assertNotEqual(self.generate(seed=2), first)
@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipes.models import Favorite, Recipe, Tag
+from users.models import Follow, User
+
+
+class DerivedFieldsTests(TestCase):
+
+    def setUp(self):
+        self.author, self.reader = [
+            User.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name, first_name='Имя',
+                last_name='Фамилия', password='password'
+            )
+            for name in ('author', 'reader')
+        ]
+        self.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png'
+        )
+
+    def test_stale_recipe_save(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        self.recipe.tags.add(self.tag)
+        Recipe.objects.filter(pk=self.recipe.pk).change_counter(
+            'favorites_count', 1
+        )
+        stale.name = 'Новое название'
+        stale.save()
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.tag_mask, self.tag.mask)
+        self.assertEqual(recipe.favorites_count, 1)
+
+    def test_stale_user_save(self):
+        stale = User.objects.get(pk=self.author.pk)
+        User.objects.filter(pk=self.author.pk).update(followers_count=3)
+        stale.first_name = 'Другое'
+        stale.save()
+        author = User.objects.get(pk=self.author.pk)
+        self.assertEqual(author.first_name, 'Другое')
+        self.assertEqual(author.followers_count, 3)
+
+    def test_reconcile(self):
+        self.recipe.tags.add(self.tag)
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Recipe.objects.update(tag_mask=0, favorites_count=5)
+        User.objects.update(followers_count=2)
+        out = StringIO()
+        call_command('reconcile_derived', check=True, stdout=out)
+        self.assertIn('tag_mask: расхождений 1', out.getvalue())
+        self.assertEqual(Recipe.objects.get().tag_mask, 0)
+        call_command('reconcile_derived', stdout=StringIO())
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.tag_mask, self.tag.mask)
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(
+            dict(User.objects.values_list('username', 'followers_count')),
+            {'author': 1, 'reader': 0}
+        )
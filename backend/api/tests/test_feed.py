@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents, token_cache
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow, User
+
+TIMELINE_SIZE = 3
+
+
+class FeedTests(TestCase):
+
+    def setUp(self):
+        recipe_documents.clear()
+        token_cache.clear()
+        self.user, self.author, self.other = [
+            User.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name, first_name='Имя',
+                last_name='Фамилия', password='password'
+            )
+            for name in ('reader', 'author', 'other')
+        ]
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+
+    def create_recipes(self, author, count):
+        return [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png'
+            ).pk
+            for number in range(count)
+        ]
+
+    def feed(self, limit=2):
+        """Ids of every feed page, following the ``next`` links."""
+        ids, url = [], f'/api/recipes/feed/?limit={limit}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def subscribe(self, author):
+        response = self.client.post(f'/api/users/{author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+
+    def test_follow_backfills_and_push_adds(self):
+        own = self.create_recipes(self.author, 2)
+        self.create_recipes(self.other, 2)
+        self.assertEqual(self.feed(), [])
+        self.subscribe(self.author)
+        self.assertEqual(self.feed(), own[::-1])
+        new = self.create_recipes(self.author, 1)
+        self.assertEqual(self.feed(), (own + new)[::-1])
+
+    def test_unfollow_removes(self):
+        self.create_recipes(self.author, 2)
+        other = self.create_recipes(self.other, 2)
+        self.subscribe(self.author)
+        self.subscribe(self.other)
+        response = self.client.delete(
+            f'/api/users/{self.author.pk}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.feed(), other[::-1])
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.user, recipe__author=self.author
+        ))
+
+    def test_popular_author_is_pulled(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        User.objects.filter(pk=self.author.pk).update(followers_count=10000)
+        own = self.create_recipes(self.author, 2)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user))
+        self.assertEqual(self.feed(), own[::-1])
+
+    @mock.patch('recipes.models.FEED_TIMELINE_SIZE', TIMELINE_SIZE)
+    def test_pages_go_past_the_timeline(self):
+        self.subscribe(self.author)
+        self.subscribe(self.other)
+        ids = []
+        for _ in range(TIMELINE_SIZE):
+            ids += self.create_recipes(self.author, 1)
+            ids += self.create_recipes(self.other, 1)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.user).count(), TIMELINE_SIZE
+        )
+        self.assertEqual(self.feed(), sorted(ids, reverse=True))
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from time import time
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from foodgram.constants import IMAGE_RELEASE_DELAY
+from recipes.models import Recipe
+from recipes.storage import content_storage
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class CollectImagesTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+
+    def save(self, content, age=0):
+        name = content_storage.save(
+            'recipes/images/image.png', ContentFile(content)
+        )
+        modified = time() - age
+        os.utime(content_storage.path(name), (modified, modified))
+        return name
+
+    def collect(self, check=False):
+        out = StringIO()
+        call_command('collect_images', check=check, stdout=out)
+        return out.getvalue()
+
+    def test_saving_refreshes_file(self):
+        name = self.save(b'image', age=2 * IMAGE_RELEASE_DELAY)
+        self.assertEqual(self.save(b'image'), name)
+        self.assertGreater(
+            os.stat(content_storage.path(name)).st_mtime,
+            time() - IMAGE_RELEASE_DELAY
+        )
+
+    def test_deleted_recipe_keeps_file(self):
+        name = self.save(b'image')
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10, image=name
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertTrue(content_storage.exists(name))
+
+    def test_collect(self):
+        age = 2 * IMAGE_RELEASE_DELAY
+        used = self.save(b'used', age=age)
+        Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10, image=used
+        )
+        unused = self.save(b'unused', age=age)
+        recent = self.save(b'recent')
+        self.assertIn('Неиспользуемых файлов: 1', self.collect(check=True))
+        self.assertTrue(content_storage.exists(unused))
+        self.assertIn('Удалено файлов: 1', self.collect())
+        self.assertFalse(content_storage.exists(unused))
+        self.assertTrue(content_storage.exists(used))
+        self.assertTrue(content_storage.exists(recent))
@@ -0,0 +1,62 @@
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from foodgram.constants import INGREDIENT_SEARCH_LIMIT
+from recipes.models import Ingredient
+
+NAMES = (
+    'Сахарная пудра', 'сахар', 'мука', 'соль', 'сахарин', 'сахар ванильный',
+)
+
+
+class IngredientSearchTests(TestCase):
+
+    def setUp(self):
+        for name in NAMES:
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        self.client = APIClient()
+
+    def search(self, name, **params):
+        response = self.client.get(
+            '/api/ingredients/', {'name': name, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_order(self):
+        self.assertEqual(self.search('Сах'), [
+            'сахар', 'сахар ванильный', 'сахарин', 'Сахарная пудра'
+        ])
+        self.assertEqual(self.search('  сахар   в')[0], 'сахар ванильный')
+
+    def test_typo(self):
+        found = self.search('сахр')
+        self.assertEqual(found[0], 'сахар')
+        self.assertEqual(
+            set(found), {'сахар', 'сахар ванильный', 'сахарин',
+                         'Сахарная пудра'}
+        )
+        self.assertEqual(self.search('сль'), ['соль'])
+        self.assertEqual(self.search('перец'), [])
+
+    def test_prefix_before_typo(self):
+        Ingredient.objects.create(name='сахр', measurement_unit='г')
+        self.assertEqual(self.search('сахр')[:2], ['сахр', 'сахар'])
+
+    def test_limit(self):
+        self.assertEqual(self.search('сах', limit=2), ['сахар',
+                                                       'сахар ванильный'])
+        self.assertEqual(self.search('сах', limit=0), [])
+        for number in range(INGREDIENT_SEARCH_LIMIT + 5):
+            Ingredient.objects.create(
+                name=f'сахар {number}', measurement_unit='г'
+            )
+        self.assertEqual(
+            len(self.search('сах', limit=INGREDIENT_SEARCH_LIMIT * 2)),
+            INGREDIENT_SEARCH_LIMIT
+        )
+        response = self.client.get(
+            '/api/ingredients/', {'name': 'сах', 'limit': 'много'}
+        )
+        self.assertEqual(response.status_code, 400)
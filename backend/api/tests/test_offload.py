@@ -0,0 +1,81 @@
+import asyncio
+import importlib
+from threading import current_thread
+from unittest import mock
+
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import clear_url_caches, resolve
+
+import api.urls
+import foodgram.urls
+from api.cache import recipe_documents
+from api.offload import run_view
+from api.snapshots import tag_snapshot
+from recipes.models import Recipe, Tag
+from users.models import User
+
+IMAGE = 'recipes/images/recipe.png'
+
+
+def reload_urls():
+    importlib.reload(api.urls)
+    importlib.reload(foodgram.urls)
+    clear_url_caches()
+
+
+class OffloadedViewsTests(TransactionTestCase):
+    """API routes wrapped into the view pool with ``ASYNC_VIEWS=True``."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with override_settings(ASYNC_VIEWS=True):
+            reload_urls()
+        cls.addClassCleanup(reload_urls)
+
+    def setUp(self):
+        recipe_documents.clear()
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        self.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание', cooking_time=10,
+            image=IMAGE, image_webp=IMAGE, image_jpeg=IMAGE,
+            image_thumbnail=IMAGE, renditions_of=IMAGE
+        )
+        tag_snapshot.invalidate()
+
+    def test_routes_wrapped(self):
+        for url in ('/api/tags/', '/api/ingredients/', '/api/recipes/',
+                    f'/api/recipes/{self.recipe.pk}/'):
+            with self.subTest(url=url):
+                self.assertTrue(
+                    asyncio.iscoroutinefunction(resolve(url).func)
+                )
+        self.assertFalse(asyncio.iscoroutinefunction(
+            resolve('/api/users/').func
+        ))
+
+    async def test_views_run_on_pool(self):
+        threads = []
+
+        def recording_run_view(*args, **kwargs):
+            threads.append(current_thread().name)
+            return run_view(*args, **kwargs)
+
+        client = AsyncClient()
+        with mock.patch('api.offload.run_view', recording_run_view):
+            tags, recipe = await asyncio.gather(
+                client.get('/api/tags/'),
+                client.get(f'/api/recipes/{self.recipe.pk}/'),
+            )
+        self.assertEqual(tags.status_code, 200)
+        self.assertEqual(tags.json()[0]['slug'], 'lunch')
+        self.assertEqual(recipe.status_code, 200)
+        self.assertEqual(recipe.json()['name'], 'Рецепт')
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith('views') for name in threads))
@@ -0,0 +1,115 @@
+from urllib.parse import urlencode
+
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents
+from api.search import recipe_search
+from recipes.models import Recipe
+from users.models import User
+
+FAVORITES = (3, 0, 5, 3, 0, 3, 1)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        recipe_documents.clear()
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        self.recipes = []
+        for number, favorites in enumerate(FAVORITES):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Суп {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png'
+            )
+            Recipe.objects.filter(pk=recipe.pk).update(
+                favorites_count=favorites
+            )
+            recipe.favorites_count = favorites
+            self.recipes.append(recipe)
+        recipe_search.invalidate()
+        self.client = APIClient()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def pages(self, url):
+        """Pages following ``next``, then the same walk by ``previous``."""
+        forward = []
+        data = self.get(url)
+        while True:
+            forward.append([recipe['id'] for recipe in data['results']])
+            if data['next'] is None:
+                break
+            data = self.get(data['next'])
+        backward = []
+        while True:
+            backward.append([recipe['id'] for recipe in data['results']])
+            if data['previous'] is None:
+                break
+            data = self.get(data['previous'])
+        return forward, backward[::-1]
+
+    def assertPages(self, url, ids, size=2):
+        forward, backward = self.pages(url)
+        expected = [ids[start:start + size]
+                    for start in range(0, len(ids), size)]
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+    def test_default_ordering(self):
+        self.assertPages(
+            '/api/recipes/?pagination=cursor&limit=2',
+            [recipe.pk for recipe in reversed(self.recipes)]
+        )
+
+    def test_popular(self):
+        # Ties of favorites_count spread over several pages.
+        popular = sorted(
+            self.recipes,
+            key=lambda recipe: (-recipe.favorites_count, -recipe.pk)
+        )
+        self.assertPages(
+            '/api/recipes/?pagination=cursor&limit=2&ordering=popular',
+            [recipe.pk for recipe in popular]
+        )
+        self.assertPages(
+            '/api/recipes/?pagination=cursor&limit=3&ordering=popular',
+            [recipe.pk for recipe in popular], size=3
+        )
+
+    def test_search_rank(self):
+        Recipe.objects.filter(pk=self.recipes[2].pk).update(text='Суп, суп')
+        recipe_search.invalidate()
+        ids = [self.recipes[2].pk] + [
+            recipe.pk for recipe in reversed(self.recipes)
+            if recipe != self.recipes[2]
+        ]
+        response = self.client.get(
+            '/api/recipes/', {'search': 'суп', 'limit': len(ids)}
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']], ids
+        )
+        self.assertPages(
+            '/api/recipes/?pagination=cursor&limit=2&'
+            + urlencode({'search': 'суп'}), ids
+        )
+
+    def test_unsupported_ordering(self):
+        response = self.client.get(
+            f'/api/recipes/{self.recipes[0].pk}/recommended/'
+            '?pagination=cursor'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=bad')
+        self.assertEqual(response.status_code, 404)
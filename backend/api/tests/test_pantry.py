@@ -0,0 +1,98 @@
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents
+from api.search import PantryIndex, RecipeIngredients, pantry_index
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+from users.models import User
+
+RECIPES = {
+    10: (1, 2),
+    11: (1, 2, 3, 4),
+    12: (1, 2, 3),
+    13: (1, 5),
+    14: (5, 6),
+    15: (1, 2),
+    16: (1, 2, 3, 4, 5, 6),
+}
+PANTRY = (1, 2, 3)
+
+
+class FixturePantryIndex(PantryIndex):
+
+    def build(self):
+        return RecipeIngredients(RECIPES)
+
+
+class PantryIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = FixturePantryIndex()
+
+    def test_ranked_by_coverage(self):
+        # Whole recipes newest first, then 3 of 4, then half covered
+        # with fewer missing first.
+        self.assertEqual(
+            self.index.match(PANTRY), [15, 12, 10, 11, 13, 16]
+        )
+
+    def test_max_missing(self):
+        self.assertEqual(
+            self.index.match(PANTRY, max_missing=1), [15, 12, 10, 11, 13]
+        )
+        self.assertEqual(self.index.match(PANTRY, max_missing=0),
+                         [15, 12, 10])
+
+    def test_limit(self):
+        self.assertEqual(self.index.match(PANTRY, limit=2), [15, 12])
+
+    def test_update_and_remove(self):
+        self.index.get()
+        self.index.update(14, (1, 2))
+        self.index.remove(15)
+        self.assertEqual(self.index.match(PANTRY, max_missing=0),
+                         [14, 12, 10])
+
+
+class PantryEndpointTests(TestCase):
+
+    def test_pantry(self):
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        ingredients = {
+            number: Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(1, 7)
+        }
+        recipes = {}
+        for key, numbers in RECIPES.items():
+            recipes[key] = Recipe.objects.create(
+                author=author, name=f'Рецепт {key}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png'
+            )
+            for number in numbers:
+                IngredientRecipe.objects.create(
+                    recipe=recipes[key], ingredient=ingredients[number],
+                    amount=1
+                )
+        pantry_index.invalidate()
+        recipe_documents.clear()
+        query = '&'.join(
+            f'ingredients={ingredients[number].pk}' for number in PANTRY
+        )
+        response = APIClient().get(
+            f'/api/recipes/pantry/?{query}&max_missing=1'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipes[key].pk for key in (15, 12, 10, 11, 13)]
+        )
+        response = APIClient().get(
+            f'/api/recipes/pantry/?{query}&max_missing=-1'
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,442 @@
+import shutil
+import tempfile
+from base64 import b64decode
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import CachedTokenAuthentication
+from api.cache import recipe_documents, token_cache
+from api.search import ingredient_index, pantry_index, recipe_search
+from api.snapshots import ingredient_snapshot, tag_masks, tag_snapshot
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+UPLOAD_ROOT = tempfile.mkdtemp()
+
+IMAGE = 'data:image/png;base64,' + (
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwAD'
+    'hgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+USERS = 6
+RECIPES_PER_USER = 4
+INGREDIENTS_PER_RECIPE = 5
+SMALL_PAGE = 2
+LARGE_PAGE = 12
+
+
+class QueryBudgetMixin:
+    """Fails with the executed SQL when a request exceeds its budget."""
+
+    def assertQueryBudget(self, budget, method, url, client=None, **kwargs):
+        client = client or self.client
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(url, **kwargs)
+            if response.streaming:
+                response.streamed_content = b''.join(
+                    response.streaming_content
+                )
+        if len(context) > budget:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(
+                f'{method.upper()} {url} made {len(context)} queries, '
+                f'budget is {budget}:\n{queries}'
+            )
+        return response, len(context)
+
+    def assertPageBudget(self, budget, url, client=None):
+        """The query count must not depend on the page size."""
+        separator = '&' if '?' in url else '?'
+        counts = []
+        for limit in (SMALL_PAGE, LARGE_PAGE):
+            recipe_documents.clear()
+            response, count = self.assertQueryBudget(
+                budget, 'get', f'{url}{separator}limit={limit}', client
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+            counts.append(count)
+        self.assertEqual(
+            counts[0], counts[1],
+            f'GET {url}: {counts[0]} queries for {SMALL_PAGE} objects, '
+            f'{counts[1]} for {LARGE_PAGE}'
+        )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, UPLOAD_ROOT=UPLOAD_ROOT)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@foodgram.ru',
+                username=f'user{number}',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password='password',
+            )
+            for number in range(USERS)
+        ]
+        cls.user = cls.users[0]
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+                ('Ужин', '#8775D2', 'dinner'),
+            )
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        )
+        Tag.objects.assign_bits()
+        cls.tags = list(Tag.objects.all())
+        cls.ingredients = list(Ingredient.objects.all())
+        for number, author in enumerate(cls.users * RECIPES_PER_USER):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/recipe.png',
+            )
+            recipe.tags.set(cls.tags[:number % len(cls.tags) + 1])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe,
+                    ingredient=cls.ingredients[
+                        (number + offset) % len(cls.ingredients)
+                    ],
+                    amount=offset + 1,
+                )
+                for offset in range(INGREDIENTS_PER_RECIPE)
+            )
+        cls.recipes = list(Recipe.objects.all())
+        for author in cls.users[1:]:
+            Follow.objects.create(user=cls.user, author=author)
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.foreign_recipe = Recipe.objects.exclude(author=cls.user).first()
+        cls.own_recipe = Recipe.objects.filter(author=cls.user).first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(UPLOAD_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        recipe_documents.clear()
+        ingredient_index.invalidate()
+        recipe_search.invalidate()
+        pantry_index.invalidate()
+        ingredient_snapshot.invalidate()
+        tag_snapshot.invalidate()
+        tag_masks.invalidate()
+        token_cache.clear()
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.auth_client = APIClient()
+        self.auth_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.clients = {
+            'anonymous': APIClient(),
+            'authenticated': self.auth_client,
+        }
+
+    def test_recipe_list(self):
+        budgets = {'anonymous': 5, 'authenticated': 8}
+        recipe_search.get()
+        tag_masks.get()
+        for name, client in self.clients.items():
+            with self.subTest(client=name):
+                self.assertPageBudget(budgets[name], '/api/recipes/', client)
+                self.assertPageBudget(
+                    budgets[name],
+                    '/api/recipes/?tags=breakfast&tags=lunch', client
+                )
+                self.assertPageBudget(
+                    budgets[name], '/api/recipes/?pagination=cursor', client
+                )
+                self.assertPageBudget(
+                    budgets[name],
+                    '/api/recipes/?search=рецепт&tags=breakfast', client
+                )
+        self.assertPageBudget(
+            9, '/api/recipes/?is_favorited=1&is_in_shopping_cart=1',
+            self.auth_client
+        )
+
+    def test_recipe_detail(self):
+        budgets = {'anonymous': 5, 'authenticated': 7}
+        url = f'/api/recipes/{self.foreign_recipe.pk}/'
+        for name, client in self.clients.items():
+            with self.subTest(client=name):
+                response, _ = self.assertQueryBudget(
+                    budgets[name], 'get', url, client
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_cached_recipe_list(self):
+        self.auth_client.get('/api/recipes/?limit=12')
+        response, _ = self.assertQueryBudget(
+            5, 'get', '/api/recipes/?limit=12', self.auth_client
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_recipe_write(self):
+        payload = {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': IMAGE,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 10}
+                for ingredient in self.ingredients[:INGREDIENTS_PER_RECIPE]
+            ],
+        }
+        response, _ = self.assertQueryBudget(
+            25, 'post', '/api/recipes/', self.auth_client,
+            data=payload, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        url = f'/api/recipes/{response.data["id"]}/'
+        rows = IngredientRecipe.objects.filter(recipe_id=response.data['id'])
+        stored = set(rows.values_list('pk', 'amount'))
+        response, _ = self.assertQueryBudget(
+            16, 'patch', url, self.auth_client, data=payload, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(set(rows.values_list('pk', 'amount')), stored)
+        response, _ = self.assertQueryBudget(
+            10, 'patch', url, self.auth_client, data={'text': 'Опечатка'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['text'], 'Опечатка')
+        payload['ingredients'][0]['amount'] = 20
+        response, _ = self.assertQueryBudget(
+            22, 'patch', url, self.auth_client, data=payload, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            {ingredient['amount'] for ingredient
+             in response.data['ingredients']},
+            {10, 20}
+        )
+        response, _ = self.assertQueryBudget(
+            13, 'delete', url, self.auth_client
+        )
+        self.assertEqual(response.status_code, 204)
+
+    def test_uploads(self):
+        content = b64decode(IMAGE.split(',', 1)[1])
+        response, _ = self.assertQueryBudget(
+            1, 'post', '/api/uploads/', self.auth_client,
+            data={'file': SimpleUploadedFile('recipe.png', content)},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        response, _ = self.assertQueryBudget(
+            1, 'post', '/api/uploads/', self.auth_client,
+            data={'size': len(content)}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        url = f'/api/uploads/{response.data["token"]}/'
+        response, _ = self.assertQueryBudget(
+            2, 'patch', url, self.auth_client, data=content,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes 0-{len(content) - 1}/{len(content)}'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        response, _ = self.assertQueryBudget(
+            1, 'get', url, self.auth_client
+        )
+        self.assertEqual(response.data['received'], len(content))
+        response, _ = self.assertQueryBudget(
+            2, 'delete', url, self.auth_client
+        )
+        self.assertEqual(response.status_code, 204)
+
+    def test_recipe_relations(self):
+        recipe = Recipe.objects.exclude(
+            favorites__user=self.user
+        ).exclude(shopping_cart__user=self.user).first()
+        budgets = {'favorite': (8, 6), 'shopping_cart': (14, 11)}
+        for action, (add_budget, delete_budget) in budgets.items():
+            with self.subTest(action=action):
+                url = f'/api/recipes/{recipe.pk}/{action}/'
+                response, _ = self.assertQueryBudget(
+                    add_budget, 'post', url, self.auth_client
+                )
+                self.assertEqual(response.status_code, 201)
+                response, _ = self.assertQueryBudget(
+                    delete_budget, 'delete', url, self.auth_client
+                )
+                self.assertEqual(response.status_code, 204)
+
+    def test_recommendations(self):
+        Favorite.objects.bulk_create(
+            Favorite(user=self.users[1], recipe=recipe)
+            for recipe in self.recipes
+        )
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertPageBudget(
+            6, f'/api/recipes/{self.foreign_recipe.pk}/recommended/'
+        )
+        self.assertPageBudget(9, '/api/recipes/for_you/', self.auth_client)
+
+    def test_feed(self):
+        call_command('rebuild_feeds', stdout=StringIO())
+        User.objects.filter(pk=self.users[1].pk).update(followers_count=10000)
+        self.assertPageBudget(7, '/api/recipes/feed/', self.auth_client)
+
+    def test_pantry(self):
+        budgets = {'anonymous': 5, 'authenticated': 8}
+        pantry_index.get()
+        query = '&'.join(
+            f'ingredients={ingredient.pk}'
+            for ingredient in self.ingredients[:10]
+        )
+        for name, client in self.clients.items():
+            with self.subTest(client=name):
+                self.assertPageBudget(
+                    budgets[name], f'/api/recipes/pantry/?{query}', client
+                )
+                self.assertPageBudget(
+                    budgets[name],
+                    f'/api/recipes/pantry/?{query}&max_missing=1', client
+                )
+
+    def test_download_shopping_cart(self):
+        for file_format in ('txt', 'csv', 'json'):
+            with self.subTest(format=file_format):
+                url = (
+                    '/api/recipes/download_shopping_cart/'
+                    f'?format={file_format}'
+                )
+                response, _ = self.assertQueryBudget(
+                    1, 'get', url, self.auth_client
+                )
+                self.assertEqual(response.status_code, 200)
+                response, _ = self.assertQueryBudget(
+                    0, 'get', url, self.auth_client
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_catalogs(self):
+        tag, ingredient = self.tags[0], self.ingredients[0]
+        urls = (
+            '/api/tags/',
+            f'/api/tags/{tag.pk}/',
+            '/api/ingredients/',
+            '/api/ingredients/?name=ингр',
+            f'/api/ingredients/{ingredient.pk}/',
+        )
+        for name, client in self.clients.items():
+            for url in urls:
+                with self.subTest(client=name, url=url):
+                    response, _ = self.assertQueryBudget(
+                        2, 'get', url, client
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_users(self):
+        self.user.is_staff = True
+        self.user.save()
+        CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertPageBudget(3, '/api/users/', self.auth_client)
+        self.assertPageBudget(
+            3, '/api/users/?pagination=cursor', self.auth_client
+        )
+        for url in ('/api/users/me/', f'/api/users/{self.users[1].pk}/'):
+            with self.subTest(url=url):
+                response, _ = self.assertQueryBudget(
+                    2, 'get', url, self.auth_client
+                )
+                self.assertEqual(response.status_code, 200)
+        response, _ = self.assertQueryBudget(
+            1, 'get', '/api/cache/', self.auth_client
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_subscriptions(self):
+        for url in ('/api/users/subscriptions/',
+                    '/api/users/subscriptions/?recipes_limit=2'):
+            with self.subTest(url=url):
+                self.assertPageBudget(4, url, self.auth_client)
+        for limit, count in (('0', 0), ('2', 2), ('', RECIPES_PER_USER)):
+            with self.subTest(recipes_limit=limit):
+                response = self.auth_client.get(
+                    f'/api/users/subscriptions/?recipes_limit={limit}'
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    {len(user['recipes'])
+                     for user in response.data['results']},
+                    {count}
+                )
+        response = self.auth_client.get(
+            '/api/users/subscriptions/?recipes_limit=-1'
+        )
+        self.assertEqual(response.status_code, 400)
+        usernames = []
+        for page in (1, 2, 3):
+            response = self.auth_client.get(
+                f'/api/users/subscriptions/?limit={SMALL_PAGE}&page={page}'
+            )
+            self.assertEqual(response.status_code, 200)
+            usernames += [
+                user['username'] for user in response.data['results']
+            ]
+        self.assertEqual(
+            usernames, sorted(user.username for user in self.users[1:])
+        )
+
+    def test_subscribe(self):
+        author = self.users[1]
+        Follow.objects.filter(user=self.user, author=author).delete()
+        url = f'/api/users/{author.pk}/subscribe/'
+        response, _ = self.assertQueryBudget(
+            12, 'post', url, self.auth_client
+        )
+        self.assertEqual(response.status_code, 201)
+        response, _ = self.assertQueryBudget(
+            7, 'delete', url, self.auth_client
+        )
+        self.assertEqual(response.status_code, 204)
+
+    def test_token(self):
+        response, _ = self.assertQueryBudget(
+            6, 'post', '/api/auth/token/login/',
+            data={'email': self.users[1].email, 'password': 'password'}
+        )
+        self.assertEqual(response.status_code, 200)
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+        )
+        response, _ = self.assertQueryBudget(
+            3, 'post', '/api/auth/token/logout/', client
+        )
+        self.assertEqual(response.status_code, 204)
@@ -0,0 +1,67 @@
+from io import StringIO
+from math import sqrt
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.recommendations import similar_recipes
+from users.models import User
+
+BASKETS = ({1, 2, 3}, {1, 2}, {2, 3}, {1, 4}, {5, 6}, {5, 7})
+
+
+class SimilarRecipesTests(SimpleTestCase):
+
+    def test_scores_and_order(self):
+        self.assertEqual(dict(similar_recipes(BASKETS, 3)), {
+            1: [(2 / 3, 2), (1 / sqrt(3), 4), (1 / sqrt(6), 3)],
+            2: [(2 / sqrt(6), 3), (2 / 3, 1)],
+            3: [(2 / sqrt(6), 2), (1 / sqrt(6), 1)],
+            4: [(1 / sqrt(3), 1)],
+            5: [(1 / sqrt(2), 7), (1 / sqrt(2), 6)],
+            6: [(1 / sqrt(2), 5)],
+            7: [(1 / sqrt(2), 5)],
+        })
+
+    def test_limit(self):
+        similar = dict(similar_recipes(BASKETS, 1))
+        self.assertEqual(similar[1], [(2 / 3, 2)])
+        self.assertEqual(similar[5], [(1 / sqrt(2), 7)])
+
+
+class RecommendedTests(TestCase):
+
+    def test_recommended_order(self):
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        recipes = {
+            number: Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/images/recipe.png'
+            )
+            for number in range(1, 5)
+        }
+        for number, basket in enumerate(BASKETS[:4]):
+            user = User.objects.create_user(
+                email=f'user{number}@foodgram.ru', username=f'user{number}',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+            for recipe in sorted(basket):
+                model = Favorite if recipe % 2 else ShoppingCart
+                model.objects.create(user=user, recipe=recipes[recipe])
+        call_command('build_recommendations', stdout=StringIO())
+        recipe_documents.clear()
+        response = APIClient().get(
+            f'/api/recipes/{recipes[1].pk}/recommended/'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipes[2].pk, recipes[4].pk, recipes[3].pk]
+        )
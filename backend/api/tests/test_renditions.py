@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from base64 import b64encode
+from io import BytesIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents, token_cache
+from foodgram.constants import RECIPE_IMAGE_SIZE, RECIPE_THUMBNAIL_SIZE
+from recipes.images import rendition_pool
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def png(color, size=(1600, 1200)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + b64encode(buffer.getvalue()).decode()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RenditionTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        recipe_documents.clear()
+        token_cache.clear()
+        user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+        )
+        self.payload = {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': png('red'),
+            'tags': [Tag.objects.create(
+                name='Обед', color='#49B64E', slug='lunch'
+            ).pk],
+            'ingredients': [{'id': Ingredient.objects.create(
+                name='соль', measurement_unit='г'
+            ).pk, 'amount': 5}],
+        }
+        patcher = mock.patch.object(rendition_pool, 'workers', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def images(self, pk):
+        response = self.client.get(f'/api/recipes/{pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['image'], response.data['images']
+
+    def test_original_stands_in(self):
+        response = self.client.post(
+            '/api/recipes/', self.payload, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        image, images = self.images(response.data['id'])
+        self.assertEqual(images, dict.fromkeys(('thumbnail', 'webp', 'jpeg'),
+                                               image))
+
+    def test_renditions_made_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/recipes/', self.payload, format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get()
+        self.assertTrue(recipe.renditions_ready)
+        for field, image_format, size in (
+                ('image_webp', 'WEBP', RECIPE_IMAGE_SIZE),
+                ('image_jpeg', 'JPEG', RECIPE_IMAGE_SIZE),
+                ('image_thumbnail', 'WEBP', RECIPE_THUMBNAIL_SIZE)):
+            with self.subTest(field=field), \
+                    getattr(recipe, field).open('rb') as file, \
+                    Image.open(file) as image:
+                self.assertEqual(image.format, image_format)
+                self.assertEqual(max(image.size), size)
+        image, images = self.images(recipe.pk)
+        self.assertTrue(images['thumbnail'].endswith(
+            recipe.image_thumbnail.url
+        ))
+        self.assertTrue(images['webp'].endswith(recipe.image_webp.url))
+        self.assertTrue(images['jpeg'].endswith(recipe.image_jpeg.url))
+        self.assertNotIn(image, images.values())
+
+    def test_replaced_image_falls_back(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/recipes/', self.payload, format='json'
+            )
+        pk = response.data['id']
+        self.images(pk)
+        response = self.client.patch(
+            f'/api/recipes/{pk}/', {'image': png('blue')}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        image, images = self.images(pk)
+        self.assertEqual(set(images.values()), {image})
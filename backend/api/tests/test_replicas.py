@@ -0,0 +1,147 @@
+from django.core.cache import cache, caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents, token_cache
+from foodgram.replicas import PRIMARY_COOKIE, read_alias
+from recipes.models import Recipe
+from users.models import User
+
+REPLICA = 'replica'
+IMAGE = 'recipes/images/recipe.png'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Reads and writes of requests with a replica of the test database.
+
+    The replica is a second connection to the same database, a test
+    mirror of the primary, so the queries each alias runs can be told
+    apart.
+    """
+
+    # The alias is added in setUpClass, after the test runner has
+    # checked the databases of the tests.
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        connections.settings[REPLICA] = {
+            **primary, 'TEST': {**primary['TEST'], 'MIRROR': DEFAULT_DB_ALIAS}
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def setUp(self):
+        cache.clear()
+        caches['replicas'].clear()
+        recipe_documents.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание',
+            cooking_time=10, image=IMAGE, image_webp=IMAGE,
+            image_jpeg=IMAGE, image_thumbnail=IMAGE, renditions_of=IMAGE
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+
+    def request(self, method, url, client=None, **kwargs):
+        """Response and the SQL run on the primary and on the replica."""
+        client = client or self.client
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = getattr(client, method)(url, **kwargs)
+        self.assertIsNone(read_alias.get())
+        return response, (
+            [query['sql'] for query in primary.captured_queries],
+            [query['sql'] for query in replica.captured_queries],
+        )
+
+    def test_safe_reads_go_to_replica(self):
+        response, (primary, replica) = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('recipes_recipe' in sql for sql in replica))
+        self.assertFalse(any('recipes_recipe' in sql for sql in primary))
+        # The token may have just been created, it is read on the primary.
+        self.assertTrue(any('authtoken_token' in sql for sql in primary))
+        self.assertFalse(any('authtoken_token' in sql for sql in replica))
+
+    def test_writes_and_reads_after_them_go_to_primary(self):
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        response, (primary, replica) = self.request('post', url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(replica, [])
+        self.assertTrue(any(sql.startswith('INSERT') for sql in primary))
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        response, (primary, replica) = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, [])
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+
+    def test_alias_reset_between_requests(self):
+        read_alias.set(REPLICA)
+        url = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        response, (_, replica) = self.request('post', url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(replica, [])
+        self.client.cookies.clear()
+        caches['replicas'].clear()
+        response, (_, replica) = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica)
+
+    def test_token_client_without_cookies(self):
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        response, _ = self.request('post', url)
+        self.assertEqual(response.status_code, 201)
+        self.client.cookies.clear()
+        response, (_, replica) = self.request('get', '/api/recipes/')
+        self.assertEqual(replica, [])
+
+    def test_anonymous_write_sticks_to_its_client_only(self):
+        writer, reader = APIClient(), APIClient()
+        response, _ = self.request(
+            'post', '/api/auth/token/login/', writer,
+            data={'email': self.user.email, 'password': 'password'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        response, (primary, replica) = self.request(
+            'get', '/api/recipes/', reader
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(primary, [])
+        self.assertTrue(replica)
+        response, (_, replica) = self.request('get', '/api/recipes/', writer)
+        self.assertEqual(replica, [])
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        },
+        'replicas': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    })
+    def test_stickiness_does_not_query_primary(self):
+        response, (primary, _) = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('django_cache' in sql for sql in primary))
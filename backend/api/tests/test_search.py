@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents
+from api.search import recipe_search
+from recipes.models import Recipe
+from users.models import User
+
+RECIPES = {
+    'borscht': ('Борщ', 'Свекла и капуста'),
+    'soup': ('Суп', 'Почти борщ'),
+    'green': ('Борщ зеленый', 'Щавель, борщ'),
+    'cutlets': ('Котлеты', 'Фарш'),
+}
+
+
+class RecipeSearchTests(TestCase):
+
+    def setUp(self):
+        recipe_documents.clear()
+        author = User.objects.create_user(
+            email='author@foodgram.ru', username='author', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        self.recipes = {
+            key: Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10,
+                image='recipes/images/recipe.png'
+            ).pk
+            for key, (name, text) in RECIPES.items()
+        }
+        recipe_search.invalidate()
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, *keys):
+        return [self.recipes[key] for key in keys]
+
+    def test_ranked(self):
+        data = self.search('БОРЩ')
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']],
+            self.ids('green', 'borscht', 'soup')
+        )
+        self.assertEqual(data['count'], 3)
+        self.assertNotIn('search_limit', data)
+
+    def test_every_word(self):
+        self.assertEqual(
+            [recipe['id'] for recipe in self.search('суп борщ')['results']],
+            self.ids('soup')
+        )
+        self.assertEqual(self.search('борщ котлеты')['results'], [])
+
+    def test_ties_newest_first(self):
+        self.assertEqual(
+            [recipe['id'] for recipe in self.search('суп')['results']],
+            self.ids('soup')
+        )
+        Recipe.objects.filter(pk=self.recipes['cutlets']).update(
+            name='Суп', text='Почти борщ'
+        )
+        recipe_search.invalidate()
+        self.assertEqual(
+            [recipe['id'] for recipe in self.search('суп')['results']],
+            self.ids('cutlets', 'soup')
+        )
+
+    def test_limit(self):
+        with mock.patch('api.search.SEARCH_RESULTS_LIMIT', 2), \
+                mock.patch('api.filters.SEARCH_RESULTS_LIMIT', 2):
+            data = self.search('борщ')
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']],
+            self.ids('green', 'borscht')
+        )
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['search_limit'], 2)
@@ -0,0 +1,142 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents, token_cache
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCartIngredient,
+                            ShoppingCartIngredientQuerySet, Tag)
+from users.models import User
+
+
+class ShoppingCartTotalsTests(TestCase):
+
+    def setUp(self):
+        recipe_documents.clear()
+        token_cache.clear()
+        self.author, self.buyer = [
+            User.objects.create_user(
+                email=f'{name}@foodgram.ru', username=name, first_name='Имя',
+                last_name='Фамилия', password='password'
+            )
+            for name in ('author', 'buyer')
+        ]
+        self.clients = {}
+        for user in (self.author, self.buyer):
+            self.clients[user] = APIClient()
+            self.clients[user].credentials(
+                HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+            )
+        self.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        self.salt, self.flour, self.milk = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'мука', 'молоко')
+        ]
+        self.pancakes = self.create_recipe({self.flour: 200, self.milk: 300})
+        self.bread = self.create_recipe({self.flour: 500, self.salt: 10})
+        for user in (self.author, self.buyer):
+            for recipe in (self.pancakes, self.bread):
+                self.add(user, recipe)
+
+    def create_recipe(self, amounts):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png'
+        )
+        recipe.tags.add(self.tag)
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def add(self, user, recipe):
+        response = self.clients[user].post(
+            f'/api/recipes/{recipe.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def assertTotals(self, user, totals):
+        self.assertEqual(
+            dict(ShoppingCartIngredient.objects.filter(user=user)
+                 .values_list('ingredient', 'total')),
+            {ingredient.pk: total for ingredient, total in totals.items()}
+        )
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects
+                .values_list('user', 'ingredient', 'total')),
+            set(ShoppingCartIngredient.objects.expected_totals())
+        )
+
+    def test_added(self):
+        for user in (self.author, self.buyer):
+            self.assertTotals(
+                user, {self.flour: 700, self.milk: 300, self.salt: 10}
+            )
+
+    def test_ingredients_edited(self):
+        response = self.clients[self.author].patch(
+            f'/api/recipes/{self.bread.pk}/', {
+                'ingredients': [
+                    {'id': self.flour.pk, 'amount': 400},
+                    {'id': self.milk.pk, 'amount': 100},
+                ],
+            }, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        for user in (self.author, self.buyer):
+            self.assertTotals(user, {self.flour: 600, self.milk: 400})
+
+    def test_removed_from_cart(self):
+        response = self.clients[self.buyer].delete(
+            f'/api/recipes/{self.pancakes.pk}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertTotals(self.buyer, {self.flour: 500, self.salt: 10})
+        self.assertTotals(
+            self.author, {self.flour: 700, self.milk: 300, self.salt: 10}
+        )
+
+    def test_recipe_deleted(self):
+        response = self.clients[self.author].delete(
+            f'/api/recipes/{self.bread.pk}/'
+        )
+        self.assertEqual(response.status_code, 204)
+        for user in (self.author, self.buyer):
+            self.assertTotals(user, {self.flour: 200, self.milk: 300})
+
+    def test_concurrent_first_insert(self):
+        bulk_create = ShoppingCartIngredientQuerySet.bulk_create
+        sugar = Ingredient.objects.create(name='сахар', measurement_unit='г')
+
+        def insert_first(queryset, *args, **kwargs):
+            # Another request commits the same row between the read
+            # and the insert.
+            ShoppingCartIngredient.objects.create(
+                user=self.buyer, ingredient=sugar, total=5
+            )
+            return bulk_create(queryset, *args, **kwargs)
+
+        with mock.patch.object(
+                ShoppingCartIngredientQuerySet, 'bulk_create', insert_first):
+            ShoppingCartIngredient.objects.add_amounts(
+                [self.buyer.pk], {sugar.pk: 20, self.salt.pk: 1}
+            )
+        self.assertEqual(
+            ShoppingCartIngredient.objects.get(
+                user=self.buyer, ingredient=sugar
+            ).total,
+            25
+        )
+        self.assertEqual(
+            ShoppingCartIngredient.objects.get(
+                user=self.buyer, ingredient=self.salt
+            ).total,
+            11
+        )
@@ -0,0 +1,96 @@
+import csv
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import recipe_documents, token_cache
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+from users.models import User
+
+INGREDIENTS = (('соль', 'г', 10), ('мука', 'г', 700), ('молоко', 'мл', 300))
+
+
+class ShoppingListDownloadTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        recipe_documents.clear()
+        token_cache.clear()
+        user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+        )
+        recipe = Recipe.objects.create(
+            author=user, name='Рецепт', text='Описание', cooking_time=10,
+            image='recipes/images/recipe.png'
+        )
+        for name, units, amount in INGREDIENTS:
+            IngredientRecipe.objects.create(
+                recipe=recipe, amount=amount,
+                ingredient=Ingredient.objects.create(
+                    name=name, measurement_unit=units
+                )
+            )
+        response = self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def download(self, file_format, streaming=True):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': file_format}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.streaming, streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename="shopping_list.{file_format}"'
+        )
+        return b''.join(response).decode()
+
+    def test_txt(self):
+        self.assertEqual(self.download('txt'), (
+            'Купить в магазине:\n'
+            'молоко: 300мл.\n'
+            'мука: 700г.\n'
+            'соль: 10г.\n'
+        ))
+
+    def test_csv(self):
+        self.assertEqual(list(csv.reader(StringIO(self.download('csv')))), [
+            ['Ингредиент', 'Количество', 'Единица измерения'],
+            ['молоко', '300', 'мл'],
+            ['мука', '700', 'г'],
+            ['соль', '10', 'г'],
+        ])
+
+    def test_json(self):
+        self.assertEqual(json.loads(self.download('json')), [
+            {'name': 'молоко', 'units': 'мл', 'total': 300},
+            {'name': 'мука', 'units': 'г', 'total': 700},
+            {'name': 'соль', 'units': 'г', 'total': 10},
+        ])
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'pdf'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('format', response.data)
+
+    def test_cached(self):
+        content = self.download('csv')
+        self.assertEqual(self.download('csv', streaming=False), content)
+
+    def test_big_file_not_cached(self):
+        with mock.patch('api.utils.SHOPPING_LIST_CACHE_MAX_SIZE', 40):
+            content = self.download('txt')
+            self.assertEqual(self.download('txt'), content)
@@ -0,0 +1,90 @@
+import gzip
+import json
+from hashlib import sha256
+from unittest import mock
+
+from django.test import TestCase
+from django.utils.cache import cc_delim_re
+
+from rest_framework.test import APIClient
+
+from api.snapshots import ingredient_snapshot, tag_snapshot
+from recipes.models import Ingredient, Tag
+
+
+class CatalogSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.tag = Tag.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        tag_snapshot.invalidate()
+        ingredient_snapshot.invalidate()
+        self.client = APIClient()
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertIn(response.status_code, (200, 304))
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertIn('Accept-Encoding', cc_delim_re.split(response['Vary']))
+        return response
+
+    def test_etag(self):
+        response = self.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['ETag'], f'"{sha256(response.content).hexdigest()}"'
+        )
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(json.loads(response.content)[0]['slug'], 'lunch')
+        self.assertEqual(self.get('/api/tags/')['ETag'], response['ETag'])
+
+    def test_not_modified(self):
+        etag = self.get('/api/ingredients/')['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*',
+                       etag[:-1] + '-gzip"'):
+            with self.subTest(header=header):
+                response = self.get(
+                    '/api/ingredients/', HTTP_IF_NONE_MATCH=header
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+        response = self.get('/api/ingredients/', HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_gzip(self):
+        identity = self.get('/api/tags/')
+        response = self.get('/api/tags/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], identity['ETag'][:-1] + '-gzip"')
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+        response = self.get('/api/tags/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_brotli_preferred(self):
+        brotli = mock.Mock(compress=lambda body: b'br' + body)
+        with mock.patch('api.snapshots.brotli', brotli):
+            tag_snapshot.invalidate()
+            identity = self.get('/api/tags/')
+            response = self.get(
+                '/api/tags/', HTTP_ACCEPT_ENCODING='gzip, deflate, br'
+            )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['ETag'], identity['ETag'][:-1] + '-br"')
+        self.assertEqual(response.content, b'br' + identity.content)
+
+    def test_etag_changes_after_edit(self):
+        for url, instance, field in (
+                ('/api/tags/', self.tag, 'name'),
+                ('/api/ingredients/', self.ingredient, 'measurement_unit')):
+            with self.subTest(url=url):
+                etag = self.get(url)['ETag']
+                setattr(instance, field, 'кг')
+                instance.save()
+                response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertIn('кг', response.content.decode())
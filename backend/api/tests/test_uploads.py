@@ -0,0 +1,145 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.test import TestCase, override_settings
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import token_cache
+from recipes.models import ImageUpload, Ingredient, Recipe, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+UPLOAD_ROOT = tempfile.mkdtemp()
+
+
+def png():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), (200, 100, 50)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, UPLOAD_ROOT=UPLOAD_ROOT)
+class ImageUploadTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(UPLOAD_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            email='user@foodgram.ru', username='user', first_name='Имя',
+            last_name='Фамилия', password='password'
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+        self.content = png()
+
+    def start(self, size):
+        response = self.client.post(
+            '/api/uploads/', {'size': size}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return f'/api/uploads/{response.data["token"]}/'
+
+    def send(self, url, start, end, total=None):
+        return self.client.patch(
+            url, self.content[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=(
+                f'bytes {start}-{end}/{total or len(self.content)}'
+            )
+        )
+
+    def upload(self, content):
+        self.content = content
+        url = self.start(len(content))
+        response = self.send(url, 0, len(content) - 1)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data['token']
+
+    def create_recipe(self, image):
+        tag = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        return self.client.post('/api/recipes/', {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': image, 'tags': [tag.pk],
+            'ingredients': [{'id': ingredient.pk, 'amount': 5}],
+        }, format='json')
+
+    def test_chunked_upload_resumes(self):
+        url = self.start(len(self.content))
+        middle = len(self.content) // 2
+        response = self.send(url, 0, middle - 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['received'], middle)
+        response = self.client.get(url)
+        self.assertEqual(response.data['received'], middle)
+        response = self.send(url, middle, len(self.content) - 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['received'], len(self.content))
+        upload = ImageUpload.objects.get()
+        with upload.file.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+
+    def test_conflicting_chunks(self):
+        url = self.start(len(self.content))
+        middle = len(self.content) // 2
+        self.send(url, 0, middle - 1)
+        for start, end, total in (
+                (middle + 1, len(self.content) - 1, None),
+                (middle - 1, len(self.content) - 1, None),
+                (middle, len(self.content), None),
+                (middle, len(self.content) - 1, len(self.content) + 1)):
+            with self.subTest(start=start, end=end, total=total):
+                response = self.send(url, start, end, total)
+                self.assertEqual(response.status_code, 409)
+                self.assertEqual(response.data['received'], middle)
+        response = self.client.patch(url, b'', content_type='image/png')
+        self.assertEqual(response.status_code, 400)
+
+    def test_recipe_from_upload(self):
+        token = self.upload(self.content)
+        response = self.create_recipe(token)
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get()
+        with recipe.image.open('rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_unfinished_upload(self):
+        url = self.start(len(self.content))
+        self.send(url, 0, 9)
+        token = url.rstrip('/').rsplit('/', 1)[1]
+        response = self.create_recipe(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+
+    def test_not_an_image(self):
+        token = self.upload(b'#!/bin/sh\necho not an image\n')
+        response = self.create_recipe(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_foreign_upload(self):
+        token = self.upload(self.content)
+        ImageUpload.objects.update(
+            user=User.objects.create_user(
+                email='other@foodgram.ru', username='other',
+                first_name='Имя', last_name='Фамилия', password='password'
+            )
+        )
+        self.assertEqual(self.create_recipe(token).status_code, 400)
+        response = self.client.get(f'/api/uploads/{token}/')
+        self.assertEqual(response.status_code, 404)
@@ -1,20 +1,33 @@
+from django.conf import settings
 from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientsViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .offload import view_pool
+from .views import (CacheStatsView, ImageUploadViewSet, IngredientsViewSet,
+                    RecipeViewSet, TagViewSet, UserViewSet)
 
 app_name = 'api'
 
+ASYNC_ROUTES = (
+    'tags-list', 'tags-detail', 'ingredients-list', 'ingredients-detail',
+    'recipes-list', 'recipes-detail',
+)
+
 router_v1 = DefaultRouter()
 router_v1.register('ingredients', IngredientsViewSet, basename='ingredients')
 router_v1.register('tags', TagViewSet, basename='tags')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 router_v1.register('users', UserViewSet, basename='subscribes')
+router_v1.register('uploads', ImageUploadViewSet, basename='uploads')
 
+router_urls = router_v1.urls
+if settings.ASYNC_VIEWS:
+    router_urls = view_pool.offload_patterns(router_urls, ASYNC_ROUTES)
 
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('cache/', CacheStatsView.as_view(), name='cache-stats'),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,28 +1,132 @@
-from io import BytesIO
+import csv
+import json
+from uuid import uuid4
 
-from django.db.models import F, Sum
-from django.http import FileResponse
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
 
-from recipes.models import IngredientRecipe, Recipe
+from foodgram.constants import (SHOPPING_LIST_CACHE_MAX_SIZE,
+                                SHOPPING_LIST_CACHE_TIMEOUT,
+                                SHOPPING_LIST_CHUNK)
+from recipes.models import ShoppingCart, ShoppingCartIngredient
 
+CART_VERSION_KEY = 'shopping-cart-version:{}'
+INGREDIENTS_VERSION_KEY = 'shopping-cart-version:ingredients'
+SHOPPING_LIST_KEY = 'shopping-list:{}:{}:{}:{}'
 
-def download_cart(user):
-    """Download the shopping list."""
-    recipes = Recipe.objects.filter(shopping_cart__user=user)
-    shopping_cart = IngredientRecipe.objects.filter(
-        recipe__in=recipes).values(
-        name=F('ingredient__name'),
-        units=F('ingredient__measurement_unit')).order_by(
-        'ingredient__name').annotate(total=Sum('amount'))
-    ingr_list = []
-    for recipe in shopping_cart:
-        ingr_list.append(recipe)
-    shopping_list = 'Купить в магазине:\n'
-    for ingredient in shopping_cart:
-        shopping_list += (
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_cart_versions(user_ids):
+    """Mark the shopping lists of the given users as changed."""
+    cache.set_many(
+        {CART_VERSION_KEY.format(pk): uuid4().hex for pk in user_ids}, None
+    )
+
+
+def bump_recipe_carts(recipe_ids):
+    bump_cart_versions(set(
+        ShoppingCart.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values_list('user_id', flat=True)
+    ))
+
+
+def bump_ingredients_version():
+    cache.set(INGREDIENTS_VERSION_KEY, uuid4().hex, None)
+
+
+class Echo:
+    """Pseudo-buffer handing the written value back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def render_txt(ingredients):
+    yield 'Купить в магазине:\n'
+    for ingredient in ingredients:
+        yield (
             f'{ingredient["name"]}: '
             f'{ingredient["total"]}'
-            f'{ingredient["units"]}.\n')
-    buffer = BytesIO(shopping_list.encode('utf8'))
-    return FileResponse(buffer, filename='shopping_list.txt',
-                        as_attachment=True)
+            f'{ingredient["units"]}.\n'
+        )
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for ingredient in ingredients:
+        yield writer.writerow(
+            (ingredient['name'], ingredient['total'], ingredient['units'])
+        )
+
+
+def render_json(ingredients):
+    separator = '['
+    for ingredient in ingredients:
+        yield separator + json.dumps(ingredient, ensure_ascii=False)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'json': (render_json, 'application/json'),
+}
+
+
+def cart_ingredients(user):
+    rows = ShoppingCartIngredient.objects.filter(user=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'total'
+    ).order_by('ingredient__name')
+    for name, units, total in rows.iterator(chunk_size=SHOPPING_LIST_CHUNK):
+        yield {'name': name, 'units': units, 'total': total}
+
+
+def cached_stream(chunks, key):
+    """Pass the chunks through and cache the file once it is done.
+
+    Only files up to ``SHOPPING_LIST_CACHE_MAX_SIZE`` are kept, bigger ones
+    are streamed without holding them in memory.
+    """
+    rendered, size = [], 0
+    for chunk in chunks:
+        chunk = chunk.encode('utf8')
+        size += len(chunk)
+        if size <= SHOPPING_LIST_CACHE_MAX_SIZE:
+            rendered.append(chunk)
+        else:
+            rendered.clear()
+        yield chunk
+    if size <= SHOPPING_LIST_CACHE_MAX_SIZE:
+        cache.set(key, b''.join(rendered), SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def download_cart(user, file_format='txt'):
+    """Download the shopping list."""
+    render, content_type = SHOPPING_LIST_FORMATS[file_format]
+    key = SHOPPING_LIST_KEY.format(
+        user.pk, get_version(CART_VERSION_KEY.format(user.pk)),
+        get_version(INGREDIENTS_VERSION_KEY), file_format
+    )
+    content = cache.get(key)
+    if content is not None:
+        response = HttpResponse(content, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            cached_stream(render(cart_ingredients(user)), key),
+            content_type=content_type
+        )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{file_format}"'
+    )
+    return response
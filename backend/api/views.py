@@ -1,47 +1,83 @@
+import re
+
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Exists
+from django.db import transaction
+from django.db.models import Count, F, Sum
 from django.shortcuts import get_object_or_404
 
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import (AllowAny, IsAuthenticated,
+from rest_framework.exceptions import ValidationError
+from rest_framework.mixins import (CreateModelMixin, DestroyModelMixin,
+                                   RetrieveModelMixin)
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.permissions import (AllowAny, IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
-                                   HTTP_400_BAD_REQUEST)
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+                                   HTTP_400_BAD_REQUEST, HTTP_409_CONFLICT)
+from rest_framework.views import APIView
+from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
+                                     ReadOnlyModelViewSet)
 
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from foodgram.constants import (FOR_YOU_SIZE, INGREDIENT_SEARCH_LIMIT,
+                                RECOMMENDED_MAX_USER_RECIPES)
+from recipes.models import (Favorite, FeedEntry, ImageUpload, Ingredient,
+                            Recipe, RecipeNeighbour, ShoppingCart,
+                            ShoppingCartIngredient, Tag)
 from users.models import Follow, User
 
-from .filters import IngredientNameFilter, RecipeFilter
-from .pagination import LimitPagesPagination
+from .cache import recipe_documents, token_cache
+from .filters import RecipeFilter
+from .negotiation import IgnoreFormatNegotiation
+from .pagination import KeysetPagination, LimitPagesPagination
 from .permissions import AuthorOrReadOnly
-from .serializers import (IngredientSerializer, RecipeCreateSerializer,
+from .relations import get_viewer_relations
+from .search import ingredient_index, pantry_index
+from .serializers import (ImageUploadSerializer, IngredientSerializer,
+                          PantrySerializer, RecipeCreateSerializer,
                           RecipeReadSerializer, ShortViewRecipeSerializer,
                           SubscribeListSerializer, TagSerializer,
                           UserSerializer)
-from .utils import download_cart
+from .snapshots import CatalogSnapshotMixin, ingredient_snapshot, tag_snapshot
+from .utils import SHOPPING_LIST_FORMATS, download_cart
+
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CatalogSnapshotMixin, ReadOnlyModelViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
+    snapshot = tag_snapshot
 
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+class IngredientsViewSet(CatalogSnapshotMixin, ReadOnlyModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_backends = (IngredientNameFilter,)
-    search_fields = ('^name',)
     pagination_class = None
+    snapshot = ingredient_snapshot
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None:
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get('limit', INGREDIENT_SEARCH_LIMIT)
+        try:
+            limit = min(int(limit), INGREDIENT_SEARCH_LIMIT)
+        except ValueError:
+            raise ValidationError({'limit': 'Нужно указать целое число'})
+        return Response(ingredient_index.search(name, limit))
 
 
 class RecipeViewSet(ModelViewSet):
@@ -52,31 +88,45 @@ class RecipeViewSet(ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
 
     def get_queryset(self):
-        queryset = (
-            Recipe
-            .objects
-            .select_related('author')
-            .prefetch_related('ingredients', 'tags')
-        )
-        user = self.request.user
-        if user.is_authenticated and self.action in ['list', 'retrieve']:
-            queryset = queryset.annotate(
-                is_favorited=Exists(Favorite.objects.get_favorited(user)),
-                is_in_shopping_cart=Exists(ShoppingCart.objects.get_cart(user))
-            )
-        return queryset
+        return Recipe.objects.select_related('author')
 
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PATCH'):
             return RecipeCreateSerializer
         return RecipeReadSerializer
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ShoppingCartIngredient.objects.change_recipe(
+            instance,
+            ShoppingCartIngredient.objects.recipe_amounts(instance),
+            {}
+        )
+        instance.delete()
+
+    def recipe_added(self, model, user, recipe):
+        Recipe.objects.filter(pk=recipe.pk).change_counter(
+            RECIPE_COUNTERS[model], 1
+        )
+        if model is ShoppingCart:
+            ShoppingCartIngredient.objects.add_recipe(user, recipe)
+
+    def recipe_removed(self, model, user, recipe):
+        Recipe.objects.filter(pk=recipe.pk).change_counter(
+            RECIPE_COUNTERS[model], -1
+        )
+        if model is ShoppingCart:
+            ShoppingCartIngredient.objects.remove_recipe(user, recipe)
+
     def add_recipe(self, request, model, pk):
 
         recipe = get_object_or_404(Recipe, pk=pk)
-        _, created = model.objects.get_or_create(
-            recipe=recipe, user=request.user
-        )
+        with transaction.atomic():
+            _, created = model.objects.get_or_create(
+                recipe=recipe, user=request.user
+            )
+            if created:
+                self.recipe_added(model, request.user, recipe)
         if created:
             serializer = ShortViewRecipeSerializer(
                 recipe, context={'request': request}
@@ -91,7 +141,9 @@ class RecipeViewSet(ModelViewSet):
         )
         if not obj.exists():
             return Response(status=HTTP_400_BAD_REQUEST)
-        obj.delete()
+        with transaction.atomic():
+            obj.delete()
+            self.recipe_removed(model, user, recipe)
         return Response(status=HTTP_204_NO_CONTENT)
 
     @action(
@@ -120,15 +172,136 @@ class RecipeViewSet(ModelViewSet):
     def delete_shopping_cart(self, request, pk=None):
         return self.delete_recipe(request.user, ShoppingCart, pk)
 
+    def recipe_page(self, queryset):
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['GET'], detail=True)
+    def recommended(self, request, pk=None):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        return self.recipe_page(
+            self.get_queryset()
+            .filter(similar_to__recipe=recipe)
+            .order_by('-similar_to__score', '-id')
+        )
+
     @action(
         methods=['GET'],
-        url_path='download_shopping_cart',
         detail=False,
         permission_classes=(IsAuthenticated,)
     )
+    def for_you(self, request):
+        relations = get_viewer_relations(request)
+        seen = sorted(
+            relations.favorited | relations.in_shopping_cart
+        )[-RECOMMENDED_MAX_USER_RECIPES:]
+        found = list(
+            RecipeNeighbour.objects
+            .filter(recipe_id__in=seen)
+            .exclude(neighbour_id__in=seen)
+            .values('neighbour_id')
+            .annotate(total=Sum('score'))
+            .order_by('-total', '-neighbour_id')
+            .values_list('neighbour_id', flat=True)[:FOR_YOU_SIZE]
+        )
+        if not found:
+            return self.recipe_page(
+                self.get_queryset()
+                .exclude(pk__in=seen)
+                .order_by('-favorites_count', '-id')
+            )
+        return self.recipe_page(self.get_queryset().in_order(found))
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=KeysetPagination
+    )
+    def feed(self, request):
+        return self.recipe_page(
+            self.filter_queryset(self.get_queryset()).feed(request.user)
+        )
+
+    @action(methods=['GET'], detail=False)
+    def pantry(self, request):
+        serializer = PantrySerializer(data={
+            **request.query_params.dict(),
+            'ingredients': request.query_params.getlist('ingredients'),
+        })
+        serializer.is_valid(raise_exception=True)
+        found = pantry_index.match(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data.get('max_missing')
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        if not found:
+            return self.recipe_page(queryset.none())
+        return self.recipe_page(queryset.in_order(found))
+
+    @action(
+        methods=['GET'],
+        url_path='download_shopping_cart',
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatNegotiation
+    )
     def download_shopping_cart(self, request):
-        user = request.user
-        return download_cart(user)
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            raise ValidationError({
+                'format': 'Доступные форматы: '
+                + ', '.join(SHOPPING_LIST_FORMATS)
+            })
+        return download_cart(request.user, file_format)
+
+
+class ImageUploadViewSet(CreateModelMixin, RetrieveModelMixin,
+                         DestroyModelMixin, GenericViewSet):
+    """Images sent ahead of the recipe, the token replaces base64.
+
+    A multipart ``file`` is stored at once. Otherwise the upload is created
+    with its ``size`` and the bytes follow in ``PATCH`` requests with a
+    ``Content-Range`` header, ``GET`` tells where to resume.
+    """
+
+    serializer_class = ImageUploadSerializer
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (JSONParser, MultiPartParser)
+
+    def get_queryset(self):
+        return self.request.user.image_uploads.all()
+
+    def partial_update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        match = CONTENT_RANGE.fullmatch(
+            request.META.get('HTTP_CONTENT_RANGE', '')
+        )
+        if match is None:
+            raise ValidationError(
+                {'Content-Range': 'Нужно указать заголовок вида '
+                                  'bytes 0-99/1000'}
+            )
+        start, end, total = map(int, match.groups())
+        if (total != upload.size or start != upload.received
+                or not start <= end < upload.size
+                or request.stream is None):
+            return Response(
+                self.get_serializer(upload).data, status=HTTP_409_CONFLICT
+            )
+        received = start + upload.write(
+            start, request.stream, end - start + 1
+        )
+        if ImageUpload.objects.filter(
+                pk=upload.pk, received=start).update(received=received):
+            upload.received = received
+        else:
+            upload.refresh_from_db(fields=('received',))
+            return Response(
+                self.get_serializer(upload).data, status=HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(upload).data)
 
 
 class UserViewSet(DjoserUserViewSet):
@@ -159,7 +332,12 @@ class UserViewSet(DjoserUserViewSet):
             author, data=request.data, context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        Follow.objects.create(user=user, author=author)
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+            User.objects.filter(pk=author.pk).update(
+                followers_count=F('followers_count') + 1
+            )
+            FeedEntry.objects.follow(user, author)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
@@ -172,7 +350,12 @@ class UserViewSet(DjoserUserViewSet):
             return Response(
                 status=status.HTTP_400_BAD_REQUEST
             )
-        follow.delete()
+        with transaction.atomic():
+            follow.delete()
+            User.objects.filter(
+                pk=author.pk, followers_count__gt=0
+            ).update(followers_count=F('followers_count') - 1)
+            FeedEntry.objects.unfollow(user, author)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -181,9 +364,27 @@ class UserViewSet(DjoserUserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(author__user=user)
+        queryset = (
+            User
+            .objects
+            .filter(author__user=user)
+            .annotate(recipes_count=Count('recipes'))
+            .order_by(*User._meta.ordering)
+        )
         pages = self.paginate_queryset(queryset)
         serializer = SubscribeListSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
+
+
+class CacheStatsView(APIView):
+    """Hit and miss counters of the in-process caches."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'recipe_documents': recipe_documents.stats(),
+            'tokens': token_cache.stats(),
+        })
@@ -3,3 +3,44 @@ MAX_LENGHT_RECIPES = 200
 MAX_LENGHT_COLOR = 7
 MIN_COOKING_TIME = 1
 MIN_INGREDIENT = 1
+RECIPE_CACHE_SIZE = 2048
+RECIPE_CACHE_TTL = 300
+CATALOG_INDEX_TTL = 300
+INGREDIENT_SEARCH_LIMIT = 50
+TRIGRAM_SIZE = 3
+TRIGRAM_SIMILARITY = 0.5
+LOAD_BATCH_SIZE = 5000
+LOAD_READ_SIZE = 64 * 1024
+SHOPPING_LIST_CHUNK = 500
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+SHOPPING_LIST_CACHE_MAX_SIZE = 256 * 1024
+RECIPE_IMAGE_SIZE = 1280
+RECIPE_THUMBNAIL_SIZE = 360
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = 2
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+UPLOAD_READ_SIZE = 64 * 1024
+UPLOAD_TTL = 24 * 60 * 60
+IMAGE_RELEASE_DELAY = 24 * 60 * 60
+SEARCH_CONFIG = 'russian'
+SEARCH_RESULTS_LIMIT = 500
+SEARCH_NAME_WEIGHT = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TAGS = 63
+RECOMMENDED_NEIGHBOURS = 20
+RECOMMENDED_MAX_USER_RECIPES = 500
+FOR_YOU_SIZE = 60
+PANTRY_RESULTS_LIMIT = 500
+PANTRY_MAX_INGREDIENTS = 100
+FEED_TIMELINE_SIZE = 500
+FEED_PUSH_MAX_FOLLOWERS = 1000
+VIEW_POOL_WORKERS = 8
+REPLICA_RETRY_INTERVAL = 30
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+DATASET_USERS = 100
+DATASET_RECIPES = 1000
+DATASET_CHUNK_SIZE = 10000
+DATASET_IMAGES = 16
+DATASET_IMAGE_SIZE = 640
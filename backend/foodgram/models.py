@@ -0,0 +1,21 @@
+class DerivedFieldsMixin:
+    """Leaves ``derived_fields`` out of the saves of a loaded instance.
+
+    They are kept up to date by ``F()`` updates, a full save of an
+    instance loaded before one of them would write back a stale value.
+    """
+
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not args and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')
+                and not self._state.adding):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.derived_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
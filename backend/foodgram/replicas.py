@@ -0,0 +1,133 @@
+from contextvars import ContextVar
+from hashlib import sha256
+from itertools import count
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.deprecation import MiddlewareMixin
+
+from .constants import REPLICA_RETRY_INTERVAL
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_COOKIE = 'primary_reads'
+PRIMARY_KEY = 'primary_reads:{}'
+# Read right after being written by another request, e.g. a new token
+# or a shopping list version kept in the database cache.
+PRIMARY_MODELS = ('authtoken.token', 'django_cache.cacheentry')
+
+read_alias = ContextVar('read_alias', default=None)
+
+
+class ReplicaPool:
+    """Round-robin over the replicas that answered the last health check.
+
+    A replica failing to connect is skipped for ``REPLICA_RETRY_INTERVAL``
+    seconds, reads fall back to the primary when no replica is up.
+    """
+
+    def __init__(self, retry_interval=REPLICA_RETRY_INTERVAL):
+        self.retry_interval = retry_interval
+        self._turn = count()
+        self._down_until = {}
+        self._lock = Lock()
+
+    def healthy(self, alias):
+        with self._lock:
+            if monotonic() < self._down_until.get(alias, 0):
+                return False
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            with self._lock:
+                self._down_until[alias] = monotonic() + self.retry_interval
+            return False
+        return True
+
+    def choose(self):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        start = next(self._turn)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Reads of safe-method requests go to the replica of the request."""
+
+    def db_for_read(self, model, **hints):
+        # The cache table has no real model, only app_label and model_name.
+        label = f'{model._meta.app_label}.{model._meta.model_name}'
+        if label in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def primary_key(request):
+    """Cache key of the client by its token or session, None if anonymous.
+
+    Clients behind the proxy share an address, so anonymous ones are only
+    followed by the cookie.
+    """
+    credential = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credential:
+        return None
+    return PRIMARY_KEY.format(sha256(credential.encode()).hexdigest())
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """Picks the database the reads of a request go to.
+
+    A client that has just written reads from the primary for
+    ``REPLICA_STICKY_SECONDS``, so it sees its own changes. The window is
+    kept in a cookie and, for clients with a token or a session that may
+    not keep cookies, in the ``replicas`` cache, which never queries the
+    primary.
+    """
+
+    def process_request(self, request):
+        read_alias.set(None)
+        if (not settings.DATABASE_REPLICAS
+                or request.method not in SAFE_METHODS
+                or PRIMARY_COOKIE in request.COOKIES):
+            return
+        key = primary_key(request)
+        if key is not None and caches['replicas'].get(key):
+            return
+        read_alias.set(replica_pool.choose())
+
+    def process_response(self, request, response):
+        read_alias.set(None)
+        if (settings.DATABASE_REPLICAS
+                and request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            window = settings.REPLICA_STICKY_SECONDS
+            key = primary_key(request)
+            if key is not None:
+                caches['replicas'].set(key, True, window)
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=window, httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+
+replica_pool = ReplicaPool()
@@ -32,6 +32,9 @@ DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
+# Hot read endpoints run as async views on a thread pool, see api.offload.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
 
 # Application definition
 
@@ -54,6 +57,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -105,6 +109,50 @@ else:
         }
     }
 
+# Read replicas: comma separated SQLite files in DEBUG, hosts otherwise.
+# Reads of GET requests go to them, see foodgram.replicas.
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    if DEBUG is True:
+        replica = {
+            **DATABASES['default'], 'NAME': os.path.join(BASE_DIR, replica)
+        }
+    else:
+        replica = {**DATABASES['default'], 'HOST': replica}
+    DATABASES[f'replica{number}'] = {**replica, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+# Shopping list versions and files must be seen by every gunicorn
+# worker, so the cache is shared: a table of the database by default, any
+# other backend can be set in the env.
+if DEBUG is True:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': os.getenv(
+                'CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'
+            ),
+            'LOCATION': os.getenv('CACHE_LOCATION', 'django_cache'),
+        }
+    }
+# The replica stickiness of token clients is looked up on every read, it
+# must not query the primary: local to the process unless set in the env.
+CACHES['replicas'] = {
+    'BACKEND': os.getenv(
+        'REPLICA_CACHE_BACKEND',
+        'django.core.cache.backends.locmem.LocMemCache'
+    ),
+    'LOCATION': os.getenv('REPLICA_CACHE_LOCATION', 'replicas'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -144,12 +192,14 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+UPLOAD_ROOT = BASE_DIR / 'uploads'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPagesPagination',
     'PAGE_SIZE': 6,
@@ -5,14 +5,10 @@ from .models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('author', 'name', 'cooking_time',
-                    'get_favorites')
+                    'favorites_count', 'shopping_cart_count')
     search_fields = ('name', 'author', 'tags')
     list_filter = ('author', 'name', 'tags')
 
-    def get_favorites(self, obj):
-        return obj.favorites.count()
-    get_favorites.short_description = 'В избранном'
-
 
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'color', 'slug',)
@@ -0,0 +1,251 @@
+from bisect import bisect
+from functools import lru_cache
+from io import BytesIO
+from itertools import accumulate
+from random import Random
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from PIL import Image
+
+from foodgram.constants import (DATASET_CHUNK_SIZE, DATASET_IMAGE_SIZE,
+                                DATASET_IMAGES, DATASET_RECIPES, DATASET_USERS,
+                                MAX_LENGHT_RECIPES)
+from users.models import Follow, User
+
+from .images import RENDITIONS, render
+from .loaders import copy_rows
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, Tag)
+
+# Popularity of recipes, authors and ingredients: rank r is picked
+# with a weight of 1 / (r + 1) ** POWER_LAW_EXPONENT.
+POWER_LAW_EXPONENT = 0.8
+# Rows per user follow a Pareto law, the mean is twice the minimum.
+ACTIVITY_ALPHA = 2
+FAVORITES_MIN = 10
+SHOPPING_CART_MIN = 2
+FOLLOWS_MIN = 5
+RECIPE_INGREDIENTS = (5, 15)
+RECIPE_MAX_TAGS = 3
+COOKING_TIME = (5, 180)
+AMOUNT = (1, 500)
+FIRST_NAMES = (
+    'Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Ирина', 'Алексей',
+    'Дмитрий', 'Сергей', 'Андрей', 'Иван', 'Михаил',
+)
+LAST_NAMES = (
+    'Иванова', 'Смирнова', 'Кузнецова', 'Попова', 'Соколова', 'Лебедева',
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев',
+)
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'password',
+    'date_joined', 'is_active', 'is_staff', 'is_superuser', 'followers_count',
+)
+RECIPE_FIELDS = (
+    'id', 'author', 'name', 'text', 'cooking_time', 'image', 'image_webp',
+    'image_jpeg', 'image_thumbnail', 'renditions_of', 'tag_mask',
+    'favorites_count', 'shopping_cart_count',
+)
+PHASES = ('users', 'recipes', 'activity')
+
+
+@lru_cache(maxsize=None)
+def cumulative_weights(size):
+    return list(accumulate(
+        1 / (rank + 1) ** POWER_LAW_EXPONENT for rank in range(size)
+    ))
+
+
+def power_law(random, size, count):
+    """Up to ``count`` distinct ranks of ``range(size)``, low ranks first."""
+    weights = cumulative_weights(size)
+    ranks = set()
+    for _ in range(2 * count):
+        if len(ranks) >= count:
+            break
+        ranks.add(min(bisect(weights, random.random() * weights[-1]),
+                      size - 1))
+    return sorted(ranks)
+
+
+def activity(random, minimum, size):
+    return min(size, int(minimum * random.paretovariate(ACTIVITY_ALPHA)))
+
+
+def placeholder_images(random, count):
+    """Solid colour images with their renditions, shared by the recipes.
+
+    Pillow runs once per image, not per recipe, and the content
+    addressed storage keeps a single file for repeated runs.
+    """
+    image_field = Recipe._meta.get_field('image')
+    images = []
+    for _ in range(count):
+        image = Image.new(
+            'RGB', (DATASET_IMAGE_SIZE, DATASET_IMAGE_SIZE * 3 // 4),
+            tuple(random.randrange(256) for _ in range(3))
+        )
+        buffer = BytesIO()
+        image.save(buffer, 'PNG')
+        names = [image_field.storage.save(
+            image_field.generate_filename(None, 'placeholder.png'),
+            ContentFile(buffer.getvalue())
+        )]
+        for field_name, size, image_format, suffix in RENDITIONS:
+            field = Recipe._meta.get_field(field_name)
+            names.append(field.storage.save(
+                field.generate_filename(None, 'placeholder' + suffix),
+                ContentFile(render(image, size, image_format))
+            ))
+        images.append(tuple(names))
+    return images
+
+
+class Dataset:
+    """Synthetic users, recipes and their activity, decided by the seed.
+
+    The rows are generated by chunks, each drawing from its own generator
+    seeded by the seed, the phase and the chunk, so the data does not
+    depend on the number of workers. Users and recipes get explicit ids
+    following the existing rows.
+    """
+
+    def __init__(self, seed, users, recipes, first_user, first_recipe,
+                 ingredients, tags, images, password):
+        self.seed = seed
+        self.users = users
+        self.recipes = recipes
+        self.first_user = first_user
+        self.first_recipe = first_recipe
+        self.ingredients = ingredients
+        self.tags = tags
+        self.images = images
+        self.password = password
+
+    @classmethod
+    def plan(cls, scale, seed, password):
+        random = Random(f'{seed}:plan')
+        ingredients = list(
+            Ingredient.objects.order_by('pk').values_list('pk', 'name')
+        )
+        random.shuffle(ingredients)
+        if not Tag.objects.exists():
+            for name, color, slug in DEFAULT_TAGS:
+                Tag.objects.create(name=name, color=color, slug=slug)
+        return cls(
+            seed=seed,
+            users=DATASET_USERS * scale,
+            recipes=DATASET_RECIPES * scale,
+            first_user=(
+                User.objects.aggregate(Max('pk'))['pk__max'] or 0
+            ) + 1,
+            first_recipe=(
+                Recipe.objects.aggregate(Max('pk'))['pk__max'] or 0
+            ) + 1,
+            ingredients=ingredients,
+            tags=list(Tag.objects.order_by('pk').values_list('pk', 'bit')),
+            images=placeholder_images(random, DATASET_IMAGES),
+            password=make_password(password),
+        )
+
+    def chunks(self, phase):
+        size = self.recipes if phase == 'recipes' else self.users
+        for start in range(0, size, DATASET_CHUNK_SIZE):
+            yield phase, start, min(start + DATASET_CHUNK_SIZE, size)
+
+    def random(self, phase, start):
+        return Random(f'{self.seed}:{phase}:{start}')
+
+    def generate(self, phase, start, stop):
+        """Insert the rows of a chunk, return the number of rows."""
+        with transaction.atomic():
+            return getattr(self, f'generate_{phase}')(start, stop)
+
+    def generate_users(self, start, stop):
+        random = self.random('users', start)
+        joined = timezone.now()
+        rows = []
+        for pk in range(self.first_user + start, self.first_user + stop):
+            rows.append((
+                pk, f'cook{pk}', f'cook{pk}@example.com',
+                random.choice(FIRST_NAMES), random.choice(LAST_NAMES),
+                self.password, joined, True, False, False, 0
+            ))
+        copy_rows(User, USER_FIELDS, rows)
+        return len(rows)
+
+    def generate_recipes(self, start, stop):
+        random = self.random('recipes', start)
+        recipes, tags, ingredients = [], [], []
+        for pk in range(self.first_recipe + start, self.first_recipe + stop):
+            chosen = [
+                self.ingredients[rank] for rank in power_law(
+                    random, len(self.ingredients),
+                    random.randint(*RECIPE_INGREDIENTS)
+                )
+            ]
+            random.shuffle(chosen)
+            recipe_tags = random.sample(
+                self.tags, random.randint(1, min(RECIPE_MAX_TAGS,
+                                                 len(self.tags)))
+            )
+            names = [name for _, name in chosen]
+            name = names[0].capitalize()
+            if len(names) > 1:
+                name = f'{name} с {names[1]}'
+            cooking_time = random.randint(*COOKING_TIME)
+            image, webp, jpeg, thumbnail = random.choice(self.images)
+            recipes.append((
+                pk, self.first_user + power_law(random, self.users, 1)[0],
+                name[:MAX_LENGHT_RECIPES],
+                f'Смешать: {", ".join(names)}. '
+                f'Готовить {cooking_time} минут.',
+                cooking_time, image, webp, jpeg, thumbnail, image,
+                sum(1 << bit for _, bit in recipe_tags if bit is not None),
+                0, 0
+            ))
+            tags.extend((pk, tag) for tag, _ in recipe_tags)
+            ingredients.extend(
+                (pk, ingredient, random.randint(*AMOUNT))
+                for ingredient, _ in chosen
+            )
+        copy_rows(Recipe, RECIPE_FIELDS, recipes)
+        copy_rows(Recipe.tags.through, ('recipe', 'tag'), tags)
+        copy_rows(
+            IngredientRecipe, ('recipe', 'ingredient', 'amount'), ingredients
+        )
+        return len(recipes) + len(tags) + len(ingredients)
+
+    def generate_activity(self, start, stop):
+        random = self.random('activity', start)
+        favorites, carts, follows = [], [], []
+        for user in range(self.first_user + start, self.first_user + stop):
+            for rows, minimum in (
+                    (favorites, FAVORITES_MIN), (carts, SHOPPING_CART_MIN)):
+                rows.extend(
+                    (user, self.first_recipe + rank) for rank in power_law(
+                        random, self.recipes,
+                        activity(random, minimum, self.recipes)
+                    )
+                )
+            follows.extend(
+                (user, self.first_user + rank) for rank in power_law(
+                    random, self.users,
+                    activity(random, FOLLOWS_MIN, self.users - 1)
+                )
+                if self.first_user + rank != user
+            )
+        copy_rows(Favorite, ('user', 'recipe'), favorites)
+        copy_rows(ShoppingCart, ('user', 'recipe'), carts)
+        copy_rows(Follow, ('user', 'author'), follows)
+        return len(favorites) + len(carts) + len(follows)
@@ -0,0 +1,114 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from threading import Lock
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.dispatch import Signal
+
+from PIL import Image, ImageOps
+
+from foodgram.constants import (RECIPE_IMAGE_QUALITY, RECIPE_IMAGE_SIZE,
+                                RECIPE_IMAGE_WORKERS, RECIPE_THUMBNAIL_SIZE)
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+renditions_ready = Signal()
+
+RENDITIONS = (
+    ('image_webp', RECIPE_IMAGE_SIZE, 'WEBP', '.webp'),
+    ('image_jpeg', RECIPE_IMAGE_SIZE, 'JPEG', '.jpg'),
+    ('image_thumbnail', RECIPE_THUMBNAIL_SIZE, 'WEBP', '_thumb.webp'),
+)
+
+
+def render(image, size, image_format):
+    """Scale the image down to fit ``size`` and encode it."""
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=RECIPE_IMAGE_QUALITY)
+    return buffer.getvalue()
+
+
+def make_renditions(recipe_id):
+    """Write the renditions of the current recipe image.
+
+    The row is only updated if the image was not replaced meanwhile,
+    otherwise the newer upload wins. Unused files are left to
+    ``collect_images``.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image or recipe.renditions_ready:
+        return False
+    source = recipe.image.name
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    stem = PurePosixPath(source).stem
+    files = {}
+    for field_name, size, image_format, suffix in RENDITIONS:
+        field = getattr(recipe, field_name)
+        files[field_name] = field.storage.save(
+            field.field.generate_filename(recipe, stem + suffix),
+            ContentFile(render(image, size, image_format))
+        )
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        renditions_of=source, **files
+    )
+    if not updated:
+        return False
+    renditions_ready.send(sender=Recipe, recipe_id=recipe_id)
+    return True
+
+
+class RenditionPool:
+    """Background threads making renditions after the upload is saved.
+
+    A recipe queued twice before a worker picks it up is processed once.
+    With no ``workers`` the renditions are made in the calling thread,
+    tests patch the pool that way.
+    """
+
+    def __init__(self, workers=RECIPE_IMAGE_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._queued = set()
+        self._lock = Lock()
+
+    def submit(self, recipe_id):
+        if not self.workers:
+            return make_renditions(recipe_id)
+        with self._lock:
+            if recipe_id in self._queued:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix='renditions'
+                )
+            self._queued.add(recipe_id)
+            return self._executor.submit(self._run, recipe_id)
+
+    def _run(self, recipe_id):
+        with self._lock:
+            self._queued.discard(recipe_id)
+        try:
+            return make_renditions(recipe_id)
+        except Exception:
+            logger.exception('Failed to make renditions of recipe %s',
+                             recipe_id)
+            return False
+        finally:
+            connection.close()
+
+
+rendition_pool = RenditionPool()
@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+from itertools import islice
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from foodgram.constants import LOAD_BATCH_SIZE, LOAD_READ_SIZE
+
+
+def read_json_array(file):
+    """Yield the items of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(LOAD_READ_SIZE)
+            if not chunk:
+                if position >= len(buffer):
+                    return
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BulkLoadCommand(BaseCommand):
+    """Streams a CSV or JSON file into ``model`` by batches.
+
+    CSV rows hold the ``fields`` in order, JSON is an array of objects with
+    these keys. Rows clashing on ``conflict_fields`` are skipped or, when
+    ``update_fields`` are set, updated, so the load can be repeated. On
+    PostgreSQL every batch goes through COPY and INSERT ... ON CONFLICT.
+    """
+
+    model = None
+    fields = ()
+    conflict_fields = ()
+    update_fields = ()
+    default_path = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=self.default_path,
+            help='Путь к файлу .csv или .json'
+        )
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=LOAD_BATCH_SIZE,
+            help='Количество строк в одной пачке'
+        )
+
+    def read_rows(self, file, file_format):
+        if file_format == 'json':
+            for item in read_json_array(file):
+                yield tuple(item[field] for field in self.fields)
+            return
+        for row in csv.reader(file):
+            if row:
+                yield tuple(value.strip() for value in row[:len(self.fields)])
+
+    def handle(self, *args, path, format, batch_size, **options):
+        if path is None:
+            raise CommandError('Укажите путь к файлу')
+        file_format = format or str(path).rsplit('.', 1)[-1].lower()
+        if file_format not in ('csv', 'json'):
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        load = (self.load_postgresql if connection.vendor == 'postgresql'
+                else self.load_batch)
+        before = self.model.objects.count()
+        rows = 0
+        started = perf_counter()
+        try:
+            with open(path, encoding='utf-8') as file:
+                for batch in batched(
+                        self.read_rows(file, file_format), batch_size):
+                    with transaction.atomic():
+                        load(batch)
+                    rows += len(batch)
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        self.loaded()
+        elapsed = perf_counter() - started
+        created = self.model.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {rows}, добавлено: {created} '
+            f'за {elapsed:.3f} с ({rows / max(elapsed, 1e-6):.0f} строк/с)'
+        ))
+
+    def loaded(self):
+        """Hook called once the whole file is in the database."""
+
+    def load_batch(self, batch):
+        objects = [self.model(**dict(zip(self.fields, row))) for row in batch]
+        if not self.update_fields:
+            self.model.objects.bulk_create(objects, ignore_conflicts=True)
+            return
+        key, = self.conflict_fields
+        existing = self.model.objects.in_bulk(
+            [getattr(obj, key) for obj in objects], field_name=key
+        )
+        new, changed = {}, {}
+        for obj in objects:
+            current = existing.get(getattr(obj, key))
+            if current is None:
+                new[getattr(obj, key)] = obj
+                continue
+            for field in self.update_fields:
+                setattr(current, field, getattr(obj, field))
+            changed[current.pk] = current
+        self.model.objects.bulk_update(changed.values(), self.update_fields)
+        self.model.objects.bulk_create(new.values())
+
+    def load_postgresql(self, batch):
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(
+            connection.ops.quote_name(field) for field in self.fields
+        )
+        conflict = ', '.join(
+            connection.ops.quote_name(field) for field in self.conflict_fields
+        )
+        if self.update_fields:
+            action = 'UPDATE SET ' + ', '.join(
+                f'{connection.ops.quote_name(field)} = '
+                f'EXCLUDED.{connection.ops.quote_name(field)}'
+                for field in self.update_fields
+            )
+        else:
+            action = 'NOTHING'
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE bulk_load ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY bulk_load ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT ON ({conflict}) {columns} FROM bulk_load '
+                f'ON CONFLICT ({conflict}) DO {action}'
+            )
+
+
+def copy_rows(model, fields, rows):
+    """Insert new ``rows`` holding ``fields``, with COPY on PostgreSQL."""
+    fields = [model._meta.get_field(field) for field in fields]
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(
+            model(**{
+                field.attname: value for field, value in zip(fields, row)
+            })
+            for row in rows
+        )
+        return
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ', '.join(
+        connection.ops.quote_name(field.column) for field in fields
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
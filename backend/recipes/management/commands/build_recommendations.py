@@ -0,0 +1,40 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram.constants import LOAD_BATCH_SIZE, RECOMMENDED_NEIGHBOURS
+from recipes.loaders import batched
+from recipes.models import RecipeNeighbour
+from recipes.recommendations import similar_recipes, user_recipes
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает похожие рецепты по совместному добавлению '
+            'в избранное и списки покупок')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--neighbours', type=int, default=RECOMMENDED_NEIGHBOURS,
+            help='Сколько похожих рецептов хранить для каждого рецепта'
+        )
+
+    def handle(self, *args, neighbours, **options):
+        started = perf_counter()
+        rows = (
+            RecipeNeighbour(
+                recipe_id=recipe, neighbour_id=neighbour, score=score
+            )
+            for recipe, similar in similar_recipes(user_recipes(), neighbours)
+            for score, neighbour in similar
+        )
+        stored = 0
+        with transaction.atomic():
+            RecipeNeighbour.objects.all().delete()
+            for batch in batched(rows, LOAD_BATCH_SIZE):
+                RecipeNeighbour.objects.bulk_create(batch)
+                stored += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено пар рецептов: {stored} '
+            f'за {perf_counter() - started:.3f} с'
+        ))
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodgram.constants import UPLOAD_TTL
+from recipes.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = 'Удаляет загрузки картинок, которые так и не попали в рецепт'
+
+    def handle(self, *args, **options):
+        expired = ImageUpload.objects.filter(
+            created__lt=timezone.now() - timedelta(seconds=UPLOAD_TTL)
+        )
+        deleted = 0
+        for upload in expired.iterator():
+            upload.delete()
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {deleted}'))
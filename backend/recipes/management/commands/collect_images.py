@@ -0,0 +1,65 @@
+import os
+from time import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.constants import IMAGE_RELEASE_DELAY, LOAD_BATCH_SIZE
+from recipes.loaders import batched
+from recipes.models import IMAGE_FIELDS, Recipe
+from recipes.storage import content_storage
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки рецептов, на которые не ссылается ни один '
+            'рецепт дольше IMAGE_RELEASE_DELAY секунд. После hash_media '
+            'запускать после перезапуска backend, иначе в его кеше '
+            'останутся старые ссылки')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить, сколько файлов можно удалить'
+        )
+
+    def handle(self, *args, check, **options):
+        deadline = time() - IMAGE_RELEASE_DELAY
+        unused = []
+        for batch in batched(self.old_files(deadline), LOAD_BATCH_SIZE):
+            names = set(batch)
+            for field in IMAGE_FIELDS:
+                names.difference_update(
+                    Recipe.objects.filter(**{f'{field}__in': names})
+                    .values_list(field, flat=True)
+                )
+            unused.extend(names)
+        if check:
+            self.stdout.write(f'Неиспользуемых файлов: {len(unused)}')
+            return
+        deleted = 0
+        for name in unused:
+            # A recipe saved since the listing refreshed the file.
+            if self.modified(name) < deadline:
+                content_storage.delete(name)
+                deleted += 1
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {deleted}'))
+
+    @staticmethod
+    def modified(name):
+        try:
+            return os.stat(content_storage.path(name)).st_mtime
+        except FileNotFoundError:
+            return time()
+
+    def old_files(self, deadline):
+        directories = {
+            Recipe._meta.get_field(field).upload_to for field in IMAGE_FIELDS
+        }
+        for directory in directories:
+            root = content_storage.path(directory)
+            for path, _, files in os.walk(root):
+                for filename in files:
+                    name = os.path.relpath(
+                        os.path.join(path, filename), content_storage.location
+                    ).replace(os.sep, '/')
+                    if self.modified(name) < deadline:
+                        yield name
@@ -0,0 +1,94 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections
+
+from recipes.dataset import PHASES, Dataset
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+DERIVED_COMMANDS = (
+    'recount_popularity', 'rebuild_shopping_carts', 'rebuild_feeds',
+    'build_recommendations',
+)
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетические данные: на единицу масштаба 100 '
+            'пользователей, 1000 рецептов, их ингредиенты, избранное, '
+            'списки покупок и подписки')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=int, default=1,
+            help='Масштаб, 1000 дает 100 тысяч пользователей и миллион '
+                 'рецептов'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора, одно зерно дает одни и те же данные'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов, только для PostgreSQL'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Пароль всех созданных пользователей'
+        )
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счетчики, итоги списков покупок, '
+                 'ленты и похожие рецепты'
+        )
+
+    def handle(self, *args, scale, seed, workers, password, skip_derived,
+               **options):
+        if scale < 1 or workers < 1:
+            raise CommandError('Масштаб и число процессов должны быть > 0')
+        if workers > 1 and connection.vendor != 'postgresql':
+            self.stderr.write('Несколько процессов нужны только PostgreSQL, '
+                              'данные создаются в одном процессе')
+            workers = 1
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', stdout=self.stdout)
+        started = perf_counter()
+        dataset = Dataset.plan(scale, seed, password)
+        for phase in PHASES:
+            phase_started = perf_counter()
+            rows = sum(self.run(dataset, phase, workers))
+            self.stdout.write(
+                f'{phase}: строк {rows} '
+                f'за {perf_counter() - phase_started:.3f} с'
+            )
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [User, Recipe]):
+                cursor.execute(sql)
+        Recipe.objects.filter(
+            pk__gte=dataset.first_recipe
+        ).update_search_vectors()
+        if not skip_derived:
+            for command in DERIVED_COMMANDS:
+                call_command(command, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {dataset.users}, рецептов: '
+            f'{dataset.recipes} за {perf_counter() - started:.3f} с'
+        ))
+
+    @staticmethod
+    def run(dataset, phase, workers):
+        chunks = list(dataset.chunks(phase))
+        if workers == 1:
+            return [dataset.generate(*chunk) for chunk in chunks]
+        # The forked workers open their own connections.
+        connections.close_all()
+        with ProcessPoolExecutor(
+                workers, mp_context=get_context('fork')) as executor:
+            return list(executor.map(
+                dataset.generate, *zip(*chunks)
+            ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import IMAGE_FIELDS, Recipe
+from recipes.storage import content_storage
+
+
+class Command(BaseCommand):
+    help = ('Переименовывает картинки рецептов по хешу содержимого, '
+            'одинаковые файлы хранятся один раз. Файлы со старыми именами '
+            'удаляет collect_images')
+
+    def handle(self, *args, **options):
+        renamed = 0
+        recipes = Recipe.objects.only('pk', 'renditions_of', *IMAGE_FIELDS)
+        for recipe in recipes.iterator():
+            changes = {}
+            for field in IMAGE_FIELDS:
+                name = getattr(recipe, field).name
+                if not name or content_storage.is_hashed(name):
+                    continue
+                if not content_storage.exists(name):
+                    self.stderr.write(f'Рецепт {recipe.pk}: нет файла {name}')
+                    continue
+                with content_storage.open(name) as file:
+                    changes[field] = content_storage.save(name, file)
+            if not changes:
+                continue
+            renamed += len(changes)
+            if 'image' in changes and recipe.renditions_ready:
+                changes['renditions_of'] = changes['image']
+            Recipe.objects.filter(pk=recipe.pk).update(**changes)
+        self.stdout.write(self.style.SUCCESS(f'Переименовано: {renamed}'))
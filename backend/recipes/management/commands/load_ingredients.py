@@ -0,0 +1,13 @@
+from django.conf import settings
+
+from recipes.loaders import BulkLoadCommand
+from recipes.models import Ingredient
+
+
+class Command(BulkLoadCommand):
+    help = 'Загружает ингредиенты из data/ingredients.csv или .json'
+
+    model = Ingredient
+    fields = ('name', 'measurement_unit')
+    conflict_fields = ('name', 'measurement_unit')
+    default_path = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
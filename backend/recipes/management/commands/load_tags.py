@@ -0,0 +1,14 @@
+from recipes.loaders import BulkLoadCommand
+from recipes.models import Tag
+
+
+class Command(BulkLoadCommand):
+    help = 'Загружает тэги (name, color, slug) из файла .csv или .json'
+
+    model = Tag
+    fields = ('name', 'color', 'slug')
+    conflict_fields = ('slug',)
+    update_fields = ('name', 'color')
+
+    def loaded(self):
+        Tag.objects.assign_bits()
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.images import make_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии картинок рецептов, которых еще нет'
+
+    def handle(self, *args, **options):
+        pending = (
+            Recipe.objects
+            .exclude(image='')
+            .exclude(renditions_of=F('image'))
+            .values_list('pk', flat=True)
+        )
+        done = failed = 0
+        for recipe_id in pending.iterator():
+            try:
+                done += make_renditions(recipe_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe_id}: {error}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Готово: {done}, с ошибками: {failed}')
+        )
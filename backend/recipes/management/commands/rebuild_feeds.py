@@ -0,0 +1,32 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram.constants import LOAD_BATCH_SIZE
+from recipes.loaders import batched
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = ('Заново строит ленты подписчиков, например после того, '
+            'как автор перешёл порог подписчиков')
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        rows = (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_ids
+            in FeedEntry.objects.expected_timelines().items()
+            for recipe_id in recipe_ids
+        )
+        stored = 0
+        with transaction.atomic():
+            FeedEntry.objects.all().delete()
+            for batch in batched(rows, LOAD_BATCH_SIZE):
+                FeedEntry.objects.bulk_create(batch)
+                stored += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено записей лент: {stored} '
+            f'за {perf_counter() - started:.3f} с'
+        ))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram.constants import LOAD_BATCH_SIZE
+from recipes.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает итоги списков покупок по корзинам и рецептам '
+            'и сообщает о расхождениях')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, ничего не менять'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, check, **options):
+        expected = {
+            (user_id, ingredient_id): total
+            for user_id, ingredient_id, total
+            in ShoppingCartIngredient.objects.expected_totals().iterator()
+        }
+        rows = ShoppingCartIngredient.objects.select_for_update()
+        extra, changed = [], []
+        for row in rows.iterator():
+            total = expected.pop((row.user_id, row.ingredient_id), None)
+            if total is None:
+                extra.append(row.pk)
+            elif total != row.total:
+                row.total = total
+                changed.append(row)
+        missing = [
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, total=total
+            )
+            for (user_id, ingredient_id), total in expected.items()
+        ]
+        self.stdout.write(
+            f'Лишних строк: {len(extra)}, неверных итогов: {len(changed)}, '
+            f'недостающих строк: {len(missing)}'
+        )
+        if check or not (extra or changed or missing):
+            return
+        for start in range(0, len(extra), LOAD_BATCH_SIZE):
+            ShoppingCartIngredient.objects.filter(
+                pk__in=extra[start:start + LOAD_BATCH_SIZE]
+            ).delete()
+        ShoppingCartIngredient.objects.bulk_update(
+            changed, ['total'], batch_size=LOAD_BATCH_SIZE
+        )
+        ShoppingCartIngredient.objects.bulk_create(
+            missing, batch_size=LOAD_BATCH_SIZE
+        )
+        self.stdout.write(self.style.SUCCESS('Итоги пересчитаны'))
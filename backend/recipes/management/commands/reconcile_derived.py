@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram.constants import LOAD_BATCH_SIZE
+from recipes.loaders import batched
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Сверяет маски тэгов рецептов и счетчики с данными '
+            'и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, ничего не менять'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, check, **options):
+        call_command('recount_popularity', check=check, stdout=self.stdout)
+        expected = defaultdict(int)
+        for recipe_id, bit in (
+                Recipe.tags.through.objects
+                .exclude(tag__bit=None)
+                .values_list('recipe_id', 'tag__bit')
+                .iterator()):
+            expected[recipe_id] |= 1 << bit
+        drifted = defaultdict(list)
+        for pk, mask in (
+                Recipe.objects.select_for_update()
+                .values_list('pk', 'tag_mask')
+                .order_by()
+                .iterator()):
+            if mask != expected.get(pk, 0):
+                drifted[expected.get(pk, 0)].append(pk)
+        count = sum(map(len, drifted.values()))
+        self.stdout.write(
+            f'{Recipe._meta.verbose_name_plural}, tag_mask: '
+            f'расхождений {count}'
+        )
+        if check:
+            return
+        for mask, pks in drifted.items():
+            for batch in batched(pks, LOAD_BATCH_SIZE):
+                Recipe.objects.filter(pk__in=batch).update(tag_mask=mask)
+        self.stdout.write(self.style.SUCCESS('Маски тэгов сверены'))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счетчики избранного, списков покупок и подписчиков '
+            'с данными и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, ничего не менять'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, check, **options):
+        for model, field, related, key in COUNTERS:
+            expected = Coalesce(
+                Subquery(
+                    related.objects.filter(**{key: OuterRef('pk')})
+                    .order_by().values(key)
+                    .annotate(total=Count('pk')).values('total')
+                ),
+                0
+            )
+            drifted = model.objects.alias(expected=expected).exclude(
+                **{field: F('expected')}
+            )
+            count = drifted.count()
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}, {field}: '
+                f'расхождений {count}'
+            )
+            if count and not check:
+                drifted.update(**{field: expected})
+        if not check:
+            self.stdout.write(self.style.SUCCESS('Счетчики сверены'))
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_jpeg',
+            field=models.ImageField(blank=True, upload_to='recipes/renditions/', verbose_name='Картинка в JPEG'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, upload_to='recipes/renditions/', verbose_name='Миниатюра'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, upload_to='recipes/renditions/', verbose_name='Картинка в WebP'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions_of',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Картинка, из которой сделаны копии'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:05
+
+from django.db import migrations, models
+
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(default=None, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/images/', verbose_name='Вкусная картинка'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_jpeg',
+            field=models.ImageField(blank=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/renditions/', verbose_name='Картинка в JPEG'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/renditions/', verbose_name='Миниатюра'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image_webp',
+            field=models.ImageField(blank=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipes/renditions/', verbose_name='Картинка в WebP'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+TIMELINE_SIZE = 500
+PUSH_MAX_FOLLOWERS = 1000
+
+
+def fill_feeds(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    for user_id, author_id in Follow.objects.filter(
+            author__followers_count__lt=PUSH_MAX_FOLLOWERS
+    ).values_list('user_id', 'author_id'):
+        FeedEntry.objects.bulk_create(
+            FeedEntry(user_id=user_id, recipe_id=pk)
+            for pk in Recipe.objects.filter(author_id=author_id)
+            .order_by('-id').values_list('pk', flat=True)[:TIMELINE_SIZE]
+        )
+    for user_id in FeedEntry.objects.values_list(
+            'user_id', flat=True).distinct():
+        entries = FeedEntry.objects.filter(user_id=user_id)
+        kept = entries.order_by('-recipe_id').values_list(
+            'pk', flat=True)[:TIMELINE_SIZE]
+        entries.exclude(pk__in=list(kept)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0010_recipeneighbour'),
+        ('users', '0002_user_followers_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи лент',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
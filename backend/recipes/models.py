@@ -1,12 +1,45 @@
+from collections import defaultdict
+from uuid import uuid4
+
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import OuterRef
+from django.db import connections, models
+from django.db.models import Case, F, IntegerField, Q, When
+from django.dispatch import Signal
 
 from colorfield.fields import ColorField
 
-from foodgram.constants import (MAX_LENGHT_COLOR, MAX_LENGHT_RECIPES,
-                                MIN_COOKING_TIME, MIN_INGREDIENT)
-from users.models import User
+from foodgram.constants import (FEED_PUSH_MAX_FOLLOWERS, FEED_TIMELINE_SIZE,
+                                LOAD_BATCH_SIZE, MAX_LENGHT_COLOR,
+                                MAX_LENGHT_RECIPES, MAX_TAGS, MIN_COOKING_TIME,
+                                MIN_INGREDIENT, SEARCH_CONFIG,
+                                UPLOAD_READ_SIZE)
+from foodgram.models import DerivedFieldsMixin
+from users.models import Follow, User
+
+from .storage import content_storage, upload_storage
+
+IMAGE_FIELDS = ('image', 'image_webp', 'image_jpeg', 'image_thumbnail')
+
+ingredients_changed = Signal()
+
+
+class TagQuerySet(models.QuerySet):
+
+    def free_bits(self):
+        used = set(self.exclude(bit=None).values_list('bit', flat=True))
+        for bit in range(MAX_TAGS):
+            if bit not in used:
+                yield bit
+        raise ValidationError(f'Тэгов не может быть больше {MAX_TAGS}')
+
+    def assign_bits(self):
+        """Give a free bit of ``Recipe.tag_mask`` to every tag without one."""
+        tags = list(self.filter(bit=None).order_by('pk'))
+        for tag, bit in zip(tags, self.free_bits()):
+            tag.bit = bit
+        self.bulk_update(tags, ['bit'])
 
 
 class Tag(models.Model):
@@ -27,10 +60,27 @@ class Tag(models.Model):
         verbose_name='Слаг тэга',
         unique=True,
     )
+    bit = models.PositiveSmallIntegerField(
+        verbose_name='Бит в маске тэгов рецепта',
+        unique=True,
+        null=True,
+        editable=False,
+    )
+
+    objects = TagQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            self.bit = next(Tag.objects.free_bits())
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
 
@@ -55,7 +105,100 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def latest_by_authors(self, author_ids, limit):
+        """Newest ``limit`` recipes of every author in one query."""
+        if not author_ids:
+            return []
+        quote = connections[self.db].ops.quote_name
+        table = quote(self.model._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return self.raw(
+            f'SELECT * FROM ('
+            f'SELECT *, ROW_NUMBER() OVER ('
+            f'PARTITION BY {quote("author_id")} ORDER BY {quote("id")} DESC'
+            f') AS {quote("row_number")} FROM {table} '
+            f'WHERE {quote("author_id")} IN ({placeholders})'
+            f') AS {quote("ranked")} WHERE {quote("row_number")} <= %s '
+            f'ORDER BY {quote("author_id")}, {quote("id")} DESC',
+            [*author_ids, limit]
+        )
+
+    def feed(self, user):
+        """Recipes of the authors followed by ``user``.
+
+        Recipes pushed into the timeline of the user are merged with the
+        ones of the followed authors too popular to be pushed. The
+        timeline keeps the newest ``FEED_TIMELINE_SIZE`` recipes, older
+        ones of the followed authors are pulled, so pages go on past it.
+        """
+        timeline = FeedEntry.objects.filter(user=user)
+        follows = Follow.objects.filter(user=user)
+        return self.filter(
+            Q(pk__in=timeline.values('recipe_id'))
+            | Q(author__in=follows.filter(
+                author__followers_count__gte=FEED_PUSH_MAX_FOLLOWERS
+            ).values('author_id'))
+            | Q(
+                author__in=follows.values('author_id'),
+                pk__lt=timeline.order_by('recipe_id').values('recipe_id')[:1]
+            )
+        )
+
+    def in_order(self, ids):
+        """Recipes with the given ids, in the order of ``ids``."""
+        return self.filter(pk__in=ids).order_by(Case(
+            *(When(pk=pk, then=position) for position, pk in enumerate(ids)),
+            output_field=IntegerField()
+        ))
+
+    def ranked(self, ids):
+        """Recipes with the given ids, best first, as ``search_rank``.
+
+        The rank is an integer, the first id gets the highest, so cursors
+        can be keyed on it.
+        """
+        return self.filter(pk__in=ids).annotate(search_rank=Case(
+            *(When(pk=pk, then=len(ids) - position)
+              for position, pk in enumerate(ids)),
+            output_field=IntegerField()
+        )).order_by('-search_rank', '-id')
+
+    def with_tags(self, mask):
+        """Recipes having any of the tags whose bits are set in ``mask``."""
+        return self.alias(
+            tag_match=F('tag_mask').bitand(mask)
+        ).filter(tag_match__gt=0)
+
+    def add_tag_mask(self, mask):
+        return self.update(tag_mask=F('tag_mask').bitor(mask))
+
+    def remove_tag_mask(self, mask):
+        return self.with_tags(mask).update(
+            tag_mask=F('tag_mask').bitand(~mask)
+        )
+
+    def change_counter(self, field, delta):
+        """Add ``delta`` to the counter ``field`` without going below 0."""
+        recipes = self
+        if delta < 0:
+            recipes = recipes.filter(**{f'{field}__gte': -delta})
+        return recipes.update(**{field: F(field) + delta})
+
+    def update_search_vectors(self):
+        """Refresh ``search_vector``, it is only kept on PostgreSQL."""
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        return self.update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            )
+        )
+
+
+class Recipe(DerivedFieldsMixin, models.Model):
 
     author = models.ForeignKey(
         User,
@@ -89,17 +232,114 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Вкусная картинка',
         upload_to='recipes/images/',
+        storage=content_storage,
         default=None,
     )
+    image_webp = models.ImageField(
+        verbose_name='Картинка в WebP',
+        upload_to='recipes/renditions/',
+        storage=content_storage,
+        blank=True,
+    )
+    image_jpeg = models.ImageField(
+        verbose_name='Картинка в JPEG',
+        upload_to='recipes/renditions/',
+        storage=content_storage,
+        blank=True,
+    )
+    image_thumbnail = models.ImageField(
+        verbose_name='Миниатюра',
+        upload_to='recipes/renditions/',
+        storage=content_storage,
+        blank=True,
+    )
+    tag_mask = models.BigIntegerField(
+        verbose_name='Маска тэгов',
+        default=0,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    renditions_of = models.CharField(
+        max_length=100,
+        verbose_name='Картинка, из которой сделаны копии',
+        blank=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    derived_fields = ('tag_mask', 'favorites_count', 'shopping_cart_count')
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popular_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def renditions_ready(self):
+        return bool(self.image) and self.renditions_of == self.image.name
+
+
+class IngredientRecipeQuerySet(models.QuerySet):
+
+    def sync(self, recipe, amounts):
+        """Bring the rows of ``recipe`` to ``{ingredient_id: amount}``.
+
+        Only new rows are inserted, changed amounts updated and dropped
+        rows deleted, ``ingredients_changed`` tells which. Returns the
+        previous amounts.
+        """
+        rows = {row.ingredient_id: row for row in self.filter(recipe=recipe)}
+        old_amounts = {pk: row.amount for pk, row in rows.items()}
+        added = [
+            self.model(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in amounts.items() if pk not in rows
+        ]
+        updated, removed = [], []
+        for pk, row in rows.items():
+            if pk not in amounts:
+                removed.append(pk)
+            elif row.amount != amounts[pk]:
+                row.amount = amounts[pk]
+                updated.append(row)
+        if removed:
+            self.filter(recipe=recipe, ingredient_id__in=removed).delete()
+        self.bulk_create(added)
+        self.bulk_update(updated, ['amount'])
+        if added or updated or removed:
+            ingredients_changed.send(
+                sender=Recipe,
+                recipe_id=recipe.pk,
+                ingredient_ids=list(amounts),
+                added=[row.ingredient_id for row in added],
+                updated=[row.ingredient_id for row in updated],
+                removed=removed,
+            )
+        return old_amounts
+
 
 class IngredientRecipe(models.Model):
 
@@ -123,16 +363,12 @@ class IngredientRecipe(models.Model):
         ]
     )
 
+    objects = IngredientRecipeQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.ingredient} {self.recipe}'
 
 
-class FavoriteQuerySet(models.QuerySet):
-
-    def get_favorited(self, user):
-        return self.filter(recipe=OuterRef('pk'), user=user)
-
-
 class Favorite(models.Model):
 
     user = models.ForeignKey(
@@ -148,8 +384,6 @@ class Favorite(models.Model):
         verbose_name='Рецепт'
     )
 
-    objects = FavoriteQuerySet.as_manager()
-
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -162,12 +396,6 @@ class Favorite(models.Model):
         return f'{self.user} {self.recipe}'
 
 
-class ShoppingCartQuerySet(models.QuerySet):
-
-    def get_cart(self, user):
-        return self.filter(recipe=OuterRef('pk'), user=user)
-
-
 class ShoppingCart(models.Model):
 
     user = models.ForeignKey(
@@ -181,7 +409,323 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart'
     )
 
-    objects = ShoppingCartQuerySet.as_manager()
+    def __str__(self):
+        return f'{self.user} {self.recipe}'
+
+
+class ShoppingCartIngredientQuerySet(models.QuerySet):
+
+    def add_amounts(self, user_ids, amounts):
+        """Add ``{ingredient_id: amount}`` to the totals of every user.
+
+        Amounts may be negative, totals that drop to zero are removed.
+        Missing rows are inserted empty and skipped on conflict, so a
+        concurrent first insert of the same row is added to, not lost.
+        """
+        amounts = {pk: amount for pk, amount in amounts.items() if amount}
+        user_ids = set(user_ids)
+        if not amounts or not user_ids:
+            return
+        rows = self.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id__in=amounts
+        )
+        existing = {(row.user_id, row.ingredient_id): row for row in rows}
+        missing = [
+            self.model(user_id=user_id, ingredient_id=ingredient_id, total=0)
+            for user_id in user_ids
+            for ingredient_id, amount in amounts.items()
+            if amount > 0 and (user_id, ingredient_id) not in existing
+        ]
+        if missing:
+            self.bulk_create(missing, ignore_conflicts=True)
+            existing.update(
+                ((row.user_id, row.ingredient_id), row)
+                for row in rows.exclude(pk__in=[
+                    row.pk for row in existing.values()
+                ])
+            )
+        for (_, ingredient_id), row in existing.items():
+            row.total = models.F('total') + amounts[ingredient_id]
+        self.bulk_update(existing.values(), ['total'])
+        self.filter(user_id__in=user_ids, total__lte=0).delete()
+
+    @staticmethod
+    def recipe_amounts(recipe):
+        return dict(
+            IngredientRecipe.objects
+            .filter(recipe=recipe)
+            .values_list('ingredient_id', 'amount')
+        )
+
+    def add_recipe(self, user, recipe):
+        self.add_amounts([user.pk], self.recipe_amounts(recipe))
+
+    def remove_recipe(self, user, recipe):
+        self.add_amounts([user.pk], {
+            pk: -amount for pk, amount in self.recipe_amounts(recipe).items()
+        })
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Move the carts holding the recipe to its new ingredients."""
+        delta = {
+            pk: new_amounts.get(pk, 0) - old_amounts.get(pk, 0)
+            for pk in old_amounts.keys() | new_amounts.keys()
+        }
+        self.add_amounts(
+            ShoppingCart.objects
+            .filter(recipe=recipe)
+            .values_list('user_id', flat=True),
+            delta
+        )
+
+    def expected_totals(self):
+        """Totals computed from scratch from the carts and the recipes."""
+        return (
+            ShoppingCart.objects
+            .values('user_id', 'recipe__ingredients_recipe__ingredient_id')
+            .annotate(total=models.Sum('recipe__ingredients_recipe__amount'))
+            .filter(total__gt=0)
+            .values_list(
+                'user_id', 'recipe__ingredients_recipe__ingredient_id',
+                'total'
+            )
+            .order_by()
+        )
+
+
+class ShoppingCartIngredient(models.Model):
+    """Ingredient totals of a shopping cart kept up to date on change."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Ингредиент'
+    )
+    total = models.IntegerField(verbose_name='Количество')
+
+    objects = ShoppingCartIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient} {self.total}'
+
+
+class ImageUpload(models.Model):
+    """Image sent ahead of the recipe, in one request or in chunks."""
+
+    token = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+        verbose_name='Токен'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='image_uploads',
+        verbose_name='Пользователь'
+    )
+    file = models.FileField(
+        storage=upload_storage,
+        verbose_name='Файл'
+    )
+    size = models.PositiveIntegerField(verbose_name='Размер в байтах')
+    received = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Получено байт'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Начата'
+    )
+
+    class Meta:
+        verbose_name = 'Загрузка картинки'
+        verbose_name_plural = 'Загрузки картинок'
+
+    def __str__(self):
+        return f'{self.user} {self.token}'
+
+    @property
+    def complete(self):
+        return self.received == self.size
+
+    def write(self, offset, stream, length):
+        """Copy up to ``length`` bytes of ``stream`` into the file."""
+        written = 0
+        with open(self.file.path, 'r+b') as file:
+            file.seek(offset)
+            while written < length:
+                chunk = stream.read(min(length - written, UPLOAD_READ_SIZE))
+                if not chunk:
+                    break
+                file.write(chunk)
+                written += len(chunk)
+        return written
+
+
+class RecipeNeighbour(models.Model):
+    """Recipe often saved together with another one, built offline."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbours',
+        verbose_name='Рецепт'
+    )
+    neighbour = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbour'],
+                name='unique_recipe_neighbour'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='recipe_neighbour_score_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} {self.neighbour} {self.score:.3f}'
+
+
+class FeedEntryQuerySet(models.QuerySet):
+
+    def push(self, recipe):
+        """Put a new recipe into the timelines of the author's followers."""
+        followers = Follow.objects.filter(
+            author_id=recipe.author_id,
+            author__followers_count__lt=FEED_PUSH_MAX_FOLLOWERS
+        ).values_list('user_id', flat=True)
+        if not followers:
+            return
+        self.bulk_create(
+            (self.model(user_id=user_id, recipe=recipe)
+             for user_id in followers),
+            batch_size=LOAD_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        self.trim(followers)
+
+    def follow(self, user, author):
+        """Backfill the timeline of ``user`` with a just followed author."""
+        recipe_ids = Recipe.objects.filter(
+            author=author,
+            author__followers_count__lt=FEED_PUSH_MAX_FOLLOWERS
+        ).values_list('pk', flat=True)[:FEED_TIMELINE_SIZE]
+        self.bulk_create(
+            (self.model(user=user, recipe_id=pk) for pk in recipe_ids),
+            ignore_conflicts=True
+        )
+        self.trim(
+            User.objects.filter(pk=user.pk).values_list('pk').order_by()
+        )
+
+    def unfollow(self, user, author):
+        self.filter(user=user, recipe__author=author).delete()
+
+    def trim(self, user_ids):
+        """Keep the newest ``FEED_TIMELINE_SIZE`` entries of the timelines.
+
+        ``user_ids`` is a queryset of user ids, used as a subquery.
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        users, params = user_ids.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {quote("id")} IN ('
+                f'SELECT {quote("id")} FROM ('
+                f'SELECT {quote("id")}, ROW_NUMBER() OVER ('
+                f'PARTITION BY {quote("user_id")} '
+                f'ORDER BY {quote("recipe_id")} DESC'
+                f') AS {quote("row_number")} FROM {table} '
+                f'WHERE {quote("user_id")} IN ({users})'
+                f') AS {quote("ranked")} WHERE {quote("row_number")} > %s)',
+                [*params, FEED_TIMELINE_SIZE]
+            )
+
+    def expected_timelines(self):
+        """Timelines built from scratch from the subscriptions."""
+        followers = defaultdict(list)
+        for user_id, author_id in Follow.objects.filter(
+                author__followers_count__lt=FEED_PUSH_MAX_FOLLOWERS
+        ).values_list('user_id', 'author_id').iterator():
+            followers[author_id].append(user_id)
+        authors = list(followers)
+        timelines = defaultdict(list)
+        for start in range(0, len(authors), LOAD_BATCH_SIZE):
+            for recipe in Recipe.objects.latest_by_authors(
+                    authors[start:start + LOAD_BATCH_SIZE],
+                    FEED_TIMELINE_SIZE):
+                for user_id in followers[recipe.author_id]:
+                    timelines[user_id].append(recipe.pk)
+        return {
+            user_id: sorted(recipe_ids, reverse=True)[:FEED_TIMELINE_SIZE]
+            for user_id, recipe_ids in timelines.items()
+        }
+
+
+class FeedEntry(models.Model):
+    """Recipe pushed into the feed of a follower of its author.
+
+    Authors with ``FEED_PUSH_MAX_FOLLOWERS`` followers and more are not
+    pushed, their recipes are merged into the feed when it is read.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
@@ -0,0 +1,44 @@
+import heapq
+from collections import Counter, defaultdict
+from math import sqrt
+
+from foodgram.constants import RECOMMENDED_MAX_USER_RECIPES
+
+from .models import Favorite, ShoppingCart
+
+
+def user_recipes():
+    """Ids of the recipes every user favorited or put in the cart."""
+    recipes = defaultdict(set)
+    for model in (Favorite, ShoppingCart):
+        for user_id, recipe_id in model.objects.values_list(
+                'user_id', 'recipe_id').iterator():
+            recipes[user_id].add(recipe_id)
+    return recipes.values()
+
+
+def similar_recipes(baskets, limit):
+    """Yield every recipe with its ``limit`` nearest ``(score, id)`` pairs.
+
+    Co-occurrence counts are the rows of the product of the sparse
+    user-recipe matrix with its transpose, normalized to the cosine
+    similarity. Rows are built one recipe at a time from the baskets
+    holding it and only the nearest pairs are kept, so memory stays
+    linear in the baskets. Only the newest recipes of huge baskets count.
+    """
+    baskets = [
+        sorted(basket)[-RECOMMENDED_MAX_USER_RECIPES:] for basket in baskets
+    ]
+    holders = defaultdict(list)
+    for index, basket in enumerate(baskets):
+        for recipe in basket:
+            holders[recipe].append(index)
+    for recipe, indexes in holders.items():
+        row = Counter()
+        for index in indexes:
+            row.update(baskets[index])
+        del row[recipe]
+        yield recipe, heapq.nlargest(limit, (
+            (count / sqrt(len(indexes) * len(holders[other])), other)
+            for other, count in row.items()
+        ))
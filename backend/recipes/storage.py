@@ -0,0 +1,71 @@
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+HASHED_NAME_LENGTH = 64
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Names files by the sha256 of their content.
+
+    ``recipes/images/<uuid>.png`` is stored as
+    ``recipes/images/ab/ab12...ef.png``, identical uploads end up in one
+    file. A file is written once and never changes, so it can be cached
+    forever. Saving a file that exists refreshes its modification time,
+    ``collect_images`` only deletes the files left unused for longer than
+    ``IMAGE_RELEASE_DELAY``.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(self.generate_filename(name), content)
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            temporary = super().save(f'{name}.part', content)
+            os.replace(self.path(temporary), self.path(name))
+        return name
+
+    @staticmethod
+    def is_hashed(name):
+        stem = os.path.splitext(posixpath.basename(name))[0]
+        return (len(stem) == HASHED_NAME_LENGTH
+                and all(char in '0123456789abcdef' for char in stem))
+
+
+@deconstructible
+class UploadStorage(FileSystemStorage):
+    """Unfinished uploads, kept under ``UPLOAD_ROOT`` outside the media."""
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.UPLOAD_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'UPLOAD_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+
+content_storage = ContentAddressedStorage()
+upload_storage = UploadStorage()
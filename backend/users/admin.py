@@ -4,7 +4,8 @@ from users.models import Follow, User
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'username', 'email', 'first_name', 'last_name')
+    list_display = ('id', 'username', 'email', 'first_name', 'last_name',
+                    'followers_count')
     search_fields = ('username', 'email')
     list_filter = ('username', 'email')
 
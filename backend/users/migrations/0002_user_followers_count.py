@@ -0,0 +1,33 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:13
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_followers(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    User.objects.update(followers_count=Coalesce(
+        models.Subquery(
+            Follow.objects.filter(author=models.OuterRef('pk'))
+            .order_by().values('author')
+            .annotate(total=models.Count('pk')).values('total')
+        ),
+        0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчики'),
+        ),
+        migrations.RunPython(fill_followers, migrations.RunPython.noop),
+    ]
@@ -4,9 +4,10 @@ from django.db import models
 from django.db.models import F, Q
 
 from foodgram.constants import MAX_LENGTH_NAME
+from foodgram.models import DerivedFieldsMixin
 
 
-class User(AbstractUser):
+class User(DerivedFieldsMixin, AbstractUser):
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name', )
@@ -30,6 +31,13 @@ class User(AbstractUser):
         verbose_name='Фамилия',
         max_length=MAX_LENGTH_NAME
     )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчики',
+        default=0,
+        editable=False,
+    )
+
+    derived_fields = ('followers_count', )
 
     class Meta:
         ordering = ('username', )